@@ -0,0 +1,43 @@
+# Generated by Django 4.0 on 2026-10-17 19:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field, **filters):
+    counts = model.objects.filter(**{field: OuterRef('pk')}, **filters).order_by().values(field).annotate(
+        total=Count('id')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def initialize_counters(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Friend = apps.get_model('friends', 'Friend')
+    FriendshipRequest = apps.get_model('friends', 'FriendshipRequest')
+    User.objects.update(
+        friend_count=count_subquery(Friend, 'to_user'),
+        pending_request_count=count_subquery(FriendshipRequest, 'to_user', viewed__isnull=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_first_name'),
+        ('friends', '0007_alter_friend_options_rename_user_friend_from_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='friend_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='pending_request_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(initialize_counters, migrations.RunPython.noop),
+    ]
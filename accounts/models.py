@@ -28,6 +28,10 @@ class User(AbstractUser):
     status = models.BooleanField(default=False)
     # Field for an optional 'about' section, a text field allowing blank values
     about = models.TextField(blank=True)
+    # Denormalized number of friends, maintained by FriendshipManager
+    friend_count = models.PositiveIntegerField(default=0)
+    # Denormalized number of received friend requests not viewed yet, maintained by FriendshipManager
+    pending_request_count = models.PositiveIntegerField(default=0)
 
     # Setting the field 'email' as the USERNAME_FIELD for authentication
     USERNAME_FIELD = "email"
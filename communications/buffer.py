@@ -0,0 +1,178 @@
+import atexit  # For flushing buffered messages on shutdown
+import logging
+import threading  # For the writer thread
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """
+        Write-behind buffer for chat messages, used when CHAT_WRITE_BEHIND is on.
+
+        A writer thread inserts the buffered messages with one bulk_create
+        CHAT_WRITE_BEHIND_INTERVAL seconds after the first of them arrived,
+        or as soon as CHAT_WRITE_BEHIND_BATCH of them are waiting. Only then
+        are their client ids passed to the `acknowledge` callback they were
+        queued with, so an acknowledged message is always stored.
+
+        A batch that fails to insert is split in halves until the failing
+        messages are isolated, the others are stored. A failing message is
+        retried CHAT_WRITE_BEHIND_RETRY_DELAY seconds later and logged and
+        dropped after CHAT_WRITE_BEHIND_RETRIES attempts. Clients resend
+        what was not acknowledged; a resend of a stored message is
+        acknowledged without inserting it again.
+    """
+
+    def __init__(self, interval=None, batch_size=None, retries=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One insert at a time, shutdown may race the writer thread
+        self._pending = []  # [(message, acknowledge callback, failed attempts), ...]
+        self._waiting = threading.Event()
+        self._full = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                self._thread.start()
+
+    def add(self, message, acknowledge=None):
+        """
+            Queue an unsaved `message`. Once it is stored, `acknowledge` is called
+            from the writer thread with the client ids of the stored messages.
+        """
+        self._ensure_thread()
+        with self._lock:
+            self._pending.append((message, acknowledge, 0))
+            full = len(self._pending) >= (self.batch_size or settings.CHAT_WRITE_BEHIND_BATCH)
+        self._waiting.set()
+        if full:
+            self._full.set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            # Sleep until a message arrives, then give the batch the interval to fill up
+            self._waiting.wait()
+            with self._lock:
+                retrying = bool(self._pending) and self._pending[0][2] > 0
+            # Messages put back after a failure give the database CHAT_WRITE_BEHIND_RETRY_DELAY to recover
+            self._full.wait(settings.CHAT_WRITE_BEHIND_RETRY_DELAY if retrying
+                            else self.interval or settings.CHAT_WRITE_BEHIND_INTERVAL)
+            self._waiting.clear()
+            self._full.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not store %d buffered chat message(s), retrying", len(self))
+            if len(self):
+                self._waiting.set()
+
+    def flush(self):
+        """
+            Insert every buffered message and acknowledge the stored ones, returns how many were stored.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                stored, failed = self._store(batch)
+            except Exception:
+                logger.exception("Could not store %d buffered chat message(s)", len(batch))
+                stored, failed = [], batch
+            retry = []
+            for message, acknowledge, attempts in failed:
+                if attempts + 1 >= (self.retries or settings.CHAT_WRITE_BEHIND_RETRIES):
+                    logger.error("Dropping chat message %s of user %s after %d failed attempts",
+                                 message.client_id, message.author_id, attempts + 1)
+                else:
+                    retry.append((message, acknowledge, attempts + 1))
+            if retry:
+                # Put back in front of the newer messages, the isolated rows no longer hold up a whole batch
+                with self._lock:
+                    self._pending[:0] = retry
+        self._acknowledge(stored)
+        return len(stored)
+
+    def _store(self, batch):
+        """
+            Insert the messages of `batch`, returns (stored entries, failed entries).
+        """
+        # Resends of a message stored by an earlier batch are only acknowledged
+        client_ids = [message.client_id for message, _, _ in batch if message.client_id is not None]
+        existing = set(
+            Message.objects.filter(client_id__in=client_ids).values_list('author_id', 'client_id')
+        ) if client_ids else set()
+
+        # A message resent while still buffered is inserted once and acknowledged on every socket
+        groups = {}
+        stored = []
+        for entry in batch:
+            message = entry[0]
+            key = (message.author_id, message.client_id) if message.client_id is not None else id(entry)
+            if key in existing:
+                stored.append(entry)
+            else:
+                groups.setdefault(key, []).append(entry)
+        inserted, failed = self._insert(list(groups.values()))
+        return stored + inserted, failed
+
+    def _insert(self, groups):
+        """
+            Bulk insert the first message of each group, splitting the groups in
+            halves on failure so one bad row does not fail the others.
+        """
+        try:
+            # A savepoint per attempt, a failed insert must not break a surrounding transaction
+            with transaction.atomic():
+                Message.objects.bulk_create([group[0][0] for group in groups])
+        except Exception:
+            if len(groups) == 1:
+                logger.exception("Could not store chat message %s of user %s",
+                                 groups[0][0][0].client_id, groups[0][0][0].author_id)
+                return [], groups[0]
+            middle = len(groups) // 2
+            first_inserted, first_failed = self._insert(groups[:middle])
+            last_inserted, last_failed = self._insert(groups[middle:])
+            return first_inserted + last_inserted, first_failed + last_failed
+        return [entry for group in groups for entry in group], []
+
+    @staticmethod
+    def _acknowledge(batch):
+        # One call per socket for all of its messages in the batch, a message resent while buffered once
+        client_ids = defaultdict(dict)
+        for message, acknowledge, _ in batch:
+            if acknowledge is not None:
+                client_ids[acknowledge][str(message.client_id)] = None
+        for acknowledge, ids in client_ids.items():
+            try:
+                acknowledge(list(ids))
+            except Exception:
+                # The messages are stored, the client resends them and gets them acknowledged then
+                logger.exception("Could not acknowledge %d chat message(s)", len(ids))
+
+
+message_buffer = MessageBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        message_buffer.flush()
+    except Exception:
+        logger.exception("Could not store %d buffered chat message(s) on shutdown", len(message_buffer))
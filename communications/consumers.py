@@ -1,18 +1,28 @@
 # Importing necessary modules and functions
+import asyncio  # For acknowledging buffered messages from the writer thread
 import json  # For JSON serialization and deserialization
+import uuid  # For the client ids of messages
 
 from asgiref.sync import async_to_sync  # For synchronous communication with channels
-from channels.generic.websocket import WebsocketConsumer  # For creating a WebSocket consumer
+from channels.db import database_sync_to_async  # For running ORM calls off the event loop
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, WebsocketConsumer  # For creating WebSocket consumers
 from channels.layers import get_channel_layer  # To get the channel layer
+from django.conf import settings  # For the history page size
 from django.contrib.auth import get_user_model  # To get the User model
 from django.db.models import Q  # For complex query operations
+from django.utils import timezone  # For timestamping buffered messages
 
+from core.delivery import deliver  # For batched delivery of notifications
+from core.pagination import keyset_page, InvalidCursor  # For paging through the history of a room
+from friends.models import Friend  # Importing the Friend model for the friendship check
+
+from .buffer import message_buffer  # For the write-behind mode
 from .models import Message, Room  # Importing local models for Message and Room
 
 User = get_user_model()  # Getting the User model dynamically
 
-# Creating a WebSocket consumer for chat functionality
-class ChatConsumer(WebsocketConsumer):
+# Thread-bound chat consumer replaced by ChatConsumer, kept for the chat_load_test comparison
+class SyncChatConsumer(WebsocketConsumer):
 
     # Initializing variables
     def __init__(self, *args, **kwargs):
@@ -56,10 +66,9 @@ class ChatConsumer(WebsocketConsumer):
             message=data['message']
         )
         
-        # Sending notification to a group using channel layer
-        channel_layer = get_channel_layer()
+        # Queueing the notification, a burst of messages reaches the friend as one batched frame
         channel = "notifications_{}".format(friend_user.username)
-        async_to_sync(channel_layer.group_send)(
+        deliver(
             channel, {
                 "type": "notify",  # method name
                 "notification": {
@@ -68,6 +77,10 @@ class ChatConsumer(WebsocketConsumer):
                 }
             }
         )
+        content = {
+            'command': 'new_message',
+            'message': self.message_to_json(message)
+        }
         return self.send_chat_message(content)
 
     # Methods for handling typing events
@@ -105,7 +118,8 @@ class ChatConsumer(WebsocketConsumer):
             'author_gender': message.author.gender,
             'friend_gender': message.friend.gender,
             'content': message.message,
-            'timestamp': str(message.timestamp)
+            'timestamp': str(message.timestamp),
+            'client_id': str(message.client_id) if message.client_id else None
         }
 
     # Dictionary mapping WebSocket commands to respective methods
@@ -123,16 +137,14 @@ class ChatConsumer(WebsocketConsumer):
             self.friend_name = self.scope['url_route']['kwargs']['friendname']
             author_user = User.objects.filter(username=self.user.username)[0]
             friend_user = User.objects.filter(username=self.friend_name)[0]
+
+            # Only friends can chat with each other, checked against the cached friend graph
+            if not Friend.objects.are_friends(author_user, friend_user):
+                self.close()
+                return
             
-            # Creating or retrieving a chat room between users
-            if Room.objects.filter(
-                    Q(author=author_user, friend=friend_user) | Q(author=friend_user, friend=author_user)
-            ).exists():
-                self.room = Room.objects.filter(
-                    Q(author=author_user, friend=friend_user) | Q(author=friend_user, friend=author_user)
-                )[0]
-            else:
-                self.room = Room.objects.create(author=author_user, friend=friend_user)
+            # Creating or retrieving the chat room of the two users
+            self.room = Room.objects.for_pair(author_user, friend_user)
             
             # Adding the WebSocket consumer to a group
             self.room_group_name = 'chat_{}_{}'.format(str(self.room.id), str(self.user.id))
@@ -170,7 +182,210 @@ class ChatConsumer(WebsocketConsumer):
     def send_message(self, message):
         self.send(text_data=json.dumps(message))
 
+    # Method for handling notifications batched by core.delivery, sent as one frame
+    def notify_batch(self, event):
+        self.send(text_data=json.dumps({'command': 'batch', 'events': event['events']}))
+
     # Method for handling chat messages sent over WebSocket
     def chat_message(self, event):
         message = event['message']
         self.send(text_data=json.dumps(message))
+
+
+# Creating an asynchronous WebSocket consumer for chat functionality, speaking the SyncChatConsumer protocol
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+        Both users of a room join the `chat_<room id>` group. Every command
+        makes at most one `database_sync_to_async` call, so a socket only
+        holds a thread pool slot while its queries run.
+    """
+
+    # Initializing variables
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.room_group_name = None
+        self.user = None
+        self.friend = None
+        self.room = None
+        self.loop = None
+        # Typing indicator state: whether typing_start was sent, when, and the automatic typing_stop
+        self.typing = False
+        self.typing_started_at = None
+        self.typing_timer = None
+
+    # Looking up the friend and the room of the two users in one database round trip
+    @database_sync_to_async
+    def open_room(self, friend_name):
+        friend = User.objects.filter(username=friend_name).first()
+        # Only friends can chat with each other, checked against the cached friend graph
+        if friend is None or not Friend.objects.are_friends(self.user, friend):
+            return None, None
+        return friend, Room.objects.for_pair(self.user, friend)
+
+    # Loading one page of the history of the room, newest first, older pages by `before` cursor
+    @database_sync_to_async
+    def load_messages(self, before=None):
+        messages, next_before = keyset_page(
+            Message.objects.filter(room=self.room).select_related('author', 'friend'),
+            cursor=before, limit=settings.CHAT_HISTORY_PAGE_SIZE, date_field='timestamp',
+        )
+        # Pages are read newest first but rendered oldest first
+        return [SyncChatConsumer.message_to_json(message) for message in reversed(messages)], next_before
+
+    # Saving a message and serializing it with the users already known to the consumer,
+    # a message resent with the same client id is stored once and reported as not created
+    @database_sync_to_async
+    def save_message(self, text, client_id):
+        message, created = Message.objects.get_or_create(
+            author=self.user, client_id=client_id,
+            defaults={'friend': self.friend, 'room': self.room, 'message': text},
+        )
+        return SyncChatConsumer.message_to_json(message), created
+
+    # Fetching messages from database, only the requesting socket gets them
+    async def fetch_messages(self, data):
+        before = data.get('before')
+        try:
+            messages, next_before = await self.load_messages(before)
+        except InvalidCursor as e:
+            await self.send_json({'command': 'error', 'message': str(e)})
+            return
+        await self.send_json({
+            'command': 'all_messages',
+            'messages': messages,
+            'before': before,  # Null for the newest page
+            'next_before': next_before  # Cursor of the older page, null when there is none
+        })
+
+    # Handling new messages, the author is the connected user whatever the payload says
+    async def new_message(self, data):
+        try:
+            client_id = uuid.UUID(data['client_id']) if data.get('client_id') else uuid.uuid4()
+        except ValueError:
+            await self.send_json({'command': 'error', 'message': "Invalid client id"})
+            return
+
+        if settings.CHAT_WRITE_BEHIND:
+            # Broadcast now, the write-behind buffer stores the message and acknowledges it afterwards
+            message = Message(author=self.user, friend=self.friend, room=self.room, message=data['message'],
+                              client_id=client_id, timestamp=timezone.now())
+            message_buffer.add(message, self.acknowledge)
+            message = SyncChatConsumer.message_to_json(message)
+        else:
+            message, created = await self.save_message(data['message'], client_id)
+            await self.send_json({'command': 'message_ack', 'client_ids': [str(client_id)]})
+            if not created:
+                return
+
+        # The message replaces the typing indicator
+        await self.stop_typing()
+
+        # Queueing the notification, a burst of messages reaches the friend as one batched frame
+        deliver(
+            "notifications_{}".format(self.friend.username), {
+                "type": "notify",  # method name
+                "notification": {
+                    "title": "Message",
+                    "body": self.user.username + " messaged you"
+                }
+            }
+        )
+        await self.send_chat_message({
+            'command': 'new_message',
+            'message': message
+        })
+
+    # Methods for handling typing events. However often the client reports keystrokes, the room gets
+    # at most one typing_start per CHAT_TYPING_INTERVAL and one typing_stop, sent CHAT_TYPING_TIMEOUT
+    # seconds after the last keystroke unless the client or a sent message stops it earlier
+    async def typing_start(self, data):
+        now = self.loop.time()
+        if self.typing_started_at is None or now - self.typing_started_at >= settings.CHAT_TYPING_INTERVAL:
+            self.typing_started_at = now
+            self.typing = True
+            await self.send_chat_message({
+                'command': 'typing_start',
+                'message': self.user.username
+            })
+        if self.typing:
+            if self.typing_timer is not None:
+                self.typing_timer.cancel()
+            self.typing_timer = self.loop.call_later(
+                settings.CHAT_TYPING_TIMEOUT, lambda: asyncio.ensure_future(self.stop_typing())
+            )
+
+    async def typing_stop(self, data):
+        await self.stop_typing()
+
+    # Sending typing_stop to the room if a typing_start was sent since the last one
+    async def stop_typing(self):
+        if self.typing_timer is not None:
+            self.typing_timer.cancel()
+            self.typing_timer = None
+        if not self.typing:
+            return
+        self.typing = False
+        await self.send_chat_message({
+            'command': 'typing_stop',
+        })
+
+    # Dictionary mapping WebSocket commands to respective methods
+    commands = {
+        'fetch_messages': fetch_messages,
+        'new_message': new_message,
+        'typing_start': typing_start,
+        'typing_stop': typing_stop,
+    }
+
+    # Method called when a WebSocket connection is established
+    async def connect(self):
+        self.loop = asyncio.get_running_loop()
+        self.user = self.scope['user']
+        if self.user.is_anonymous:
+            await self.close()
+            return
+        self.friend, self.room = await self.open_room(self.scope['url_route']['kwargs']['friendname'])
+        if self.room is None:
+            await self.close()
+            return
+
+        # Adding the WebSocket consumer to the group shared by both users of the room
+        self.room_group_name = 'chat_{}'.format(self.room.id)
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+
+    # Method called when a WebSocket connection is closed
+    async def disconnect(self, close_code):
+        if self.room_group_name is not None:
+            await self.stop_typing()
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+
+    # Method called when a WebSocket receives data, unknown commands are ignored
+    async def receive_json(self, content, **kwargs):
+        command = self.commands.get(content.get('command'))
+        if command is not None:
+            await command(self, content)
+
+    # Sending chat messages to the room group using channel layer
+    async def send_chat_message(self, message):
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_message',
+                'message': message
+            }
+        )
+
+    # Method for handling notifications batched by core.delivery, sent as one frame
+    async def notify_batch(self, event):
+        await self.send_json({'command': 'batch', 'events': event['events']})
+
+    # Method for handling chat messages sent over WebSocket
+    async def chat_message(self, event):
+        await self.send_json(event['message'])
+
+    # Method the write-behind buffer calls from its thread once messages of this socket are stored
+    def acknowledge(self, client_ids):
+        asyncio.run_coroutine_threadsafe(
+            self.send_json({'command': 'message_ack', 'client_ids': client_ids}), self.loop
+        )
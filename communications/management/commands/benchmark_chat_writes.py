@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts.models import User
+from communications.buffer import MessageBuffer
+from communications.models import Message, Room
+
+
+class Command(BaseCommand):
+    help = ("Compare how fast concurrent chat writers store messages one INSERT at a time "
+            "and through the write-behind buffer, in a test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=5000,
+                            help="Number of messages stored per mode")
+        parser.add_argument('--writers', type=int, default=8,
+                            help="Number of threads writing at the same time, like consumers on the thread pool")
+        parser.add_argument('--interval', type=float, default=0.005,
+                            help="CHAT_WRITE_BEHIND_INTERVAL used by the buffer")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="CHAT_WRITE_BEHIND_BATCH used by the buffer")
+
+    def handle(self, *args, **options):
+        # SQLite test databases live in memory by default, a file keeps the cost of committing to disk
+        directory = None
+        if connection.vendor == 'sqlite':
+            directory = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            User.objects.bulk_create([
+                User(username="bench{}".format(i), email="bench{}@example.com".format(i), password="!")
+                for i in range(2)
+            ])
+            author, friend = User.objects.filter(username__startswith="bench").order_by('id')
+            room = Room.objects.for_pair(author, friend)
+
+            self.stdout.write("{:<14}{:>10}{:>12}{:>12}".format("mode", "messages", "seconds", "msg/s"))
+            for name, write in (('insert', self.insert), ('write-behind', self.write_behind)):
+                Message.objects.all().delete()
+                elapsed = write(author, friend, room, options)
+                stored = Message.objects.count()
+                self.stdout.write("{:<14}{:>10}{:>12.2f}{:>12.0f}".format(name, stored, elapsed, stored / elapsed))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if directory is not None:
+                os.rmdir(directory)
+
+    @staticmethod
+    def run_writers(options, write_one):
+        per_writer = options['messages'] // options['writers']
+
+        def writer(number):
+            for i in range(per_writer):
+                write_one("message {} of writer {}".format(i, number))
+            connection.close()
+
+        threads = [threading.Thread(target=writer, args=(number,)) for number in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def insert(self, author, friend, room, options):
+        start = time.perf_counter()
+        self.run_writers(options, lambda text: Message.objects.create(
+            author=author, friend=friend, room=room, message=text, client_id=uuid.uuid4()))
+        return time.perf_counter() - start
+
+    def write_behind(self, author, friend, room, options):
+        buffer = MessageBuffer(interval=options['interval'], batch_size=options['batch_size'])
+        start = time.perf_counter()
+        self.run_writers(options, lambda text: buffer.add(
+            Message(author=author, friend=friend, room=room, message=text, client_id=uuid.uuid4())))
+        # The clock stops once the last message is stored, not when the writers are done queueing
+        buffer.flush()
+        return time.perf_counter() - start
@@ -0,0 +1,146 @@
+import asyncio
+import itertools
+import random
+import statistics
+import time
+
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import re_path
+
+from accounts.models import User
+from communications.consumers import ChatConsumer, SyncChatConsumer
+from friends.models import Friend
+
+CONSUMERS = {
+    'sync': SyncChatConsumer,
+    'async': ChatConsumer,
+}
+
+
+def create_pairs(count):
+    """
+        Create `count` pairs of befriended users, returns [(user, friend), ...]
+        with each pair listed from both sides.
+    """
+    User.objects.bulk_create([
+        User(username="load{}".format(i), email="load{}@example.com".format(i), password="!", gender="male")
+        for i in range(count * 2)
+    ])
+    users = list(User.objects.filter(username__startswith="load").order_by('id'))
+    pairs = list(zip(users[0::2], users[1::2]))
+    Friend.objects.create_friendships([(user.id, friend.id) for user, friend in pairs])
+    return pairs + [(friend, user) for user, friend in pairs]
+
+
+def percentile(timings, fraction):
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Open many chat sockets against the sync and async chat consumers in a test database "
+            "and report the sustained messages per second and round-trip latency")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--sockets', type=int, default=2000,
+                            help="Number of open sockets, every socket is one side of a chat")
+        parser.add_argument('--duration', type=float, default=10,
+                            help="Seconds every socket keeps sending messages")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds a socket waits between two messages")
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help="Seconds a message may take to come back before it counts as lost, "
+                                 "which also drops its socket")
+        parser.add_argument('--connect-timeout', type=float, default=120.0,
+                            help="Seconds all sockets together may take to connect")
+        parser.add_argument('--in-memory', action='store_true',
+                            help="Use the in-memory channel layer instead of CHANNEL_LAYERS. It scans every channel "
+                                 "on each receive, so it only gives meaningful numbers for a few hundred sockets")
+
+    def handle(self, *args, **options):
+        names = ['sync', 'async'] if options['consumer'] == 'both' else [options['consumer']]
+
+        # Everything is written to a throwaway database, never to the configured one
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}} if options['in_memory'] \
+                else None
+            with override_settings(**({'CHANNEL_LAYERS': layers} if layers else {})):
+                channel_layers.backends = {}
+                pairs = create_pairs(options['sockets'] // 2)
+
+                self.stdout.write("{:<8}{:>9}{:>11}{:>10}{:>10}{:>10}{:>10}".format(
+                    "consumer", "sockets", "messages", "msg/s", "p50 ms", "p99 ms", "lost"))
+                for name in names:
+                    result = asyncio.run(self.run(CONSUMERS[name], pairs, options))
+                    self.stdout.write("{:<8}{:>9}{:>11}{:>10.0f}{:>10.1f}{:>10.1f}{:>10}".format(name, *result))
+            channel_layers.backends = {}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    async def run(self, consumer, pairs, options):
+        application = URLRouter([re_path(r'^ws/chat/(?P<friendname>[^/]+)/$', consumer.as_asgi())])
+
+        communicators = []
+        for user, friend in pairs:
+            communicator = WebsocketCommunicator(application, "/ws/chat/{}/".format(friend.username))
+            communicator.scope['user'] = user
+            communicators.append((user, friend, communicator))
+
+        async def connect(communicator):
+            # Thousands of handshakes queue up behind each other, only the chat traffic is measured
+            try:
+                accepted, _ = await communicator.connect(timeout=options['connect_timeout'])
+            except asyncio.TimeoutError:
+                return False
+            return accepted
+
+        connected = await asyncio.gather(*[connect(communicator) for _, _, communicator in communicators])
+        communicators = [item for item, accepted in zip(communicators, connected) if accepted]
+
+        timings = []
+        lost = 0
+        tokens = itertools.count()
+        deadline = time.monotonic() + options['duration']
+
+        async def chat(user, friend, communicator):
+            nonlocal lost
+            # Spread the first messages over one interval so the load is steady instead of one burst
+            await asyncio.sleep(random.uniform(0, options['interval']))
+            while time.monotonic() < deadline:
+                token = "m{}".format(next(tokens))
+                start = time.perf_counter()
+                await communicator.send_json_to({
+                    'command': 'new_message', 'message': token, 'from': user.username, 'friend': friend.username,
+                })
+                # Frames of the other side of the chat are skipped until our own message comes back
+                try:
+                    while True:
+                        frame = await communicator.receive_json_from(timeout=options['timeout'])
+                        if frame.get('command') == 'new_message' and frame['message']['content'] == token:
+                            break
+                    timings.append((time.perf_counter() - start) * 1000)
+                except asyncio.TimeoutError:
+                    # The communicator cancels the consumer on a timeout, the socket is gone
+                    lost += 1
+                    return False
+                await asyncio.sleep(options['interval'])
+            return True
+
+        started = time.monotonic()
+        alive = await asyncio.gather(*[chat(*item) for item in communicators])
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*[
+            communicator.disconnect() for (_, _, communicator), open_ in zip(communicators, alive) if open_
+        ])
+
+        timings.sort()
+        if not timings:
+            return len(communicators), 0, 0, 0, 0, lost
+        return (len(communicators), len(timings), len(timings) / elapsed,
+                statistics.median(timings), percentile(timings, 0.99), lost)
@@ -0,0 +1,54 @@
+# Generated by Django 4.0 on 2026-10-17 20:24
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def pair_key(user1_id, user2_id):
+    # Frozen copy of communications.models.pair_key, this migration must not follow later changes to it
+    return "{}:{}".format(*sorted((user1_id, user2_id)))
+
+
+def merge_rooms(apps, schema_editor):
+    """
+        Give every room its pair key. When a pair has several rooms, their
+        messages move to the one holding the oldest message and the others go.
+    """
+    Room = apps.get_model('communications', 'Room')
+    Message = apps.get_model('communications', 'Message')
+
+    rooms = defaultdict(list)
+    for room_id, author_id, friend_id in Room.objects.values_list('id', 'author_id', 'friend_id').iterator():
+        rooms[pair_key(author_id, friend_id)].append(room_id)
+
+    for key, room_ids in rooms.items():
+        kept = room_ids[0]
+        if len(room_ids) > 1:
+            kept = Message.objects.filter(room_id__in=room_ids).order_by('timestamp', 'id') \
+                       .values_list('room_id', flat=True).first() or kept
+            duplicates = [room_id for room_id in room_ids if room_id != kept]
+            Message.objects.filter(room_id__in=duplicates).update(room_id=kept)
+            Room.objects.filter(id__in=duplicates).delete()
+        Room.objects.filter(id=kept).update(pair_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0003_message_room_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='pair_key',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(merge_rooms, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='room',
+            name='pair_key',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
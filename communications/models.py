@@ -1,15 +1,52 @@
 import uuid  # Importing the uuid module for generating unique identifiers
 
+from django.conf import settings  # For the room cache timeout
 from django.contrib.auth import get_user_model  # Importing the function to get the User model
+from django.core.cache import cache  # For caching the room of each user pair
 from django.db import models  # Importing Django's models module
+from django.utils import timezone  # For the default message timestamp
 
 User = get_user_model()  # Getting the User model dynamically
 
+
+def pair_key(user1_id, user2_id):
+    # The same key whichever of the two users opens the chat
+    return "{}:{}".format(*sorted((user1_id, user2_id)))
+
+
+def room_cache_key(key):
+    return "chat:room:{}".format(key)
+
+
+# Creating a manager resolving the room of two users
+class RoomManager(models.Manager):
+
+    # Method returning the room of two users, created on first use. Concurrent callers get the same room:
+    # the pair key is unique and get_or_create fetches the row the other caller inserted
+    def for_pair(self, user1, user2):
+        key = pair_key(user1.id, user2.id)
+        values = cache.get(room_cache_key(key))
+        if values is None:
+            room, _ = self.get_or_create(pair_key=key, defaults={'author': user1, 'friend': user2})
+            cache.set(room_cache_key(key), (room.id, room.author_id, room.friend_id), settings.CHAT_ROOM_CACHE_TIMEOUT)
+            return room
+
+        # Rooms are never modified, the cached columns stand in for the row
+        room_id, author_id, friend_id = values
+        room = self.model(id=room_id, author_id=author_id, friend_id=friend_id, pair_key=key)
+        room._state.adding = False
+        room._state.db = self.db
+        return room
+
+
 # Creating a model for Chat Rooms
 class Room(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Unique identifier for the room
     author = models.ForeignKey(User, related_name='author_room', on_delete=models.CASCADE)  # Author of the room
     friend = models.ForeignKey(User, related_name='friend_room', on_delete=models.CASCADE)  # Friend in the room
+    pair_key = models.CharField(max_length=64, unique=True)  # "<lower user id>:<higher user id>", one room per pair
+
+    objects = RoomManager()
 
 # Creating a model for Messages within a Room
 class Message(models.Model):
@@ -17,7 +54,19 @@ class Message(models.Model):
     friend = models.ForeignKey(User, related_name='friend_messages', on_delete=models.CASCADE)  # Message recipient
     room = models.ForeignKey(Room, related_name='messages', on_delete=models.DO_NOTHING)  # Room associated with message
     message = models.TextField()  # Content of the message
-    timestamp = models.DateTimeField(auto_now_add=True)  # Timestamp of when the message was created
+    # Timestamp of when the message was sent, a default rather than auto_now_add so a buffered write keeps the broadcast value
+    timestamp = models.DateTimeField(default=timezone.now)
+    client_id = models.UUIDField(blank=True, null=True)  # Id the sending client gave the message, for acks and resends
+
+    class Meta:
+        indexes = [
+            # Serves the history of a room, newest page first then older pages by cursor
+            models.Index(fields=['room', 'timestamp', 'id'], name='communications_history_idx'),
+        ]
+        constraints = [
+            # A message resent by its client is stored once
+            models.UniqueConstraint(fields=['author', 'client_id'], name='communications_client_id_uniq'),
+        ]
 
     def __str__(self):
         return self.message + " " + str(self.timestamp)  # String representation of the message and its timestamp
@@ -1,3 +1,78 @@
+import uuid
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from communications.buffer import MessageBuffer
+from communications.models import Message, Room
+
+
+class MessageBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.friend = (
+            User.objects.create_user(username=username, email='{}@example.com'.format(username),
+                                     password='x', gender='male')
+            for username in ('author', 'friend')
+        )
+        cls.room = Room.objects.for_pair(cls.author, cls.friend)
+
+    def setUp(self):
+        # The writer thread waits an hour before a flush, the tests flush by hand
+        self.buffer = MessageBuffer(interval=3600)
+        self.acknowledged = []
+
+    def add(self, text, **fields):
+        fields.setdefault('client_id', uuid.uuid4())
+        message = Message(author=self.author, friend=self.friend, room=self.room, message=text, **fields)
+        self.buffer.add(message, self.acknowledged.extend)
+        return message
+
+    def test_flush_keeps_the_broadcast_timestamp(self):
+        sent_at = timezone.now() - timedelta(seconds=5)
+        message = self.add("hello", timestamp=sent_at)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Message.objects.get(client_id=message.client_id).timestamp, sent_at)
+
+    def test_bad_row_is_isolated(self):
+        good = [self.add("first"), self.add("second")]
+        bad = self.add(None)  # Violates NOT NULL on insert
+        good.append(self.add("third"))
+        with self.assertLogs('communications.buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(set(Message.objects.values_list('message', flat=True)), {"first", "second", "third"})
+        self.assertEqual(sorted(self.acknowledged), sorted(str(message.client_id) for message in good))
+        # Only the failing message waits for a retry
+        self.assertEqual(len(self.buffer), 1)
+        self.assertNotIn(str(bad.client_id), self.acknowledged)
+
+    def test_resend_of_a_stored_message_is_acknowledged_once_stored(self):
+        stored = self.add("hello")
+        self.buffer.flush()
+        # Resent after a reconnect, and twice while still buffered
+        resent = self.add("hello", client_id=stored.client_id)
+        twice = uuid.uuid4()
+        self.add("again", client_id=twice)
+        self.add("again", client_id=twice)
+        self.acknowledged.clear()
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(Message.objects.filter(client_id=resent.client_id).count(), 1)
+        self.assertEqual(Message.objects.filter(client_id=twice).count(), 1)
+        self.assertEqual(sorted(self.acknowledged), sorted([str(stored.client_id), str(twice)]))
+        self.assertEqual(len(self.buffer), 0)
 
-# Create your tests here.
+    def test_failing_message_is_dropped_at_the_retry_cap(self):
+        buffer = MessageBuffer(interval=3600, retries=2)
+        bad = Message(author=self.author, friend=self.friend, room=self.room, message=None, client_id=uuid.uuid4())
+        buffer.add(bad, self.acknowledged.extend)
+        with self.assertLogs('communications.buffer', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 0)
+            self.assertEqual(len(buffer), 1)
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer), 0)
+        self.assertTrue(any("after 2 failed attempts" in line for line in logs.output))
+        self.assertEqual(self.acknowledged, [])
+        self.assertFalse(Message.objects.filter(client_id=bad.client_id).exists())
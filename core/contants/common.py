@@ -1,3 +1,10 @@
 FRIEND_REQUEST_VERB = "friend_request"
 COMMENT_VERB = "comment"
 LIKE_VERB = "like"
+
+# Relationship of a user to the current user, see FriendshipManager.relationship_statuses
+RELATIONSHIP_NONE = "none"
+RELATIONSHIP_FRIEND = "friend"
+RELATIONSHIP_REQUEST_SENT = "request_sent"
+RELATIONSHIP_REQUEST_RECEIVED = "request_received"
+RELATIONSHIP_REJECTED = "rejected"
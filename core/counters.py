@@ -0,0 +1,18 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+def adjust(queryset, **deltas):
+    """
+        Atomically add `delta` to each counter column of the matching rows with a
+        single UPDATE, never letting a counter drop below zero:
+
+            adjust(User.objects.filter(id__in=ids), friend_count=1)
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
@@ -0,0 +1,98 @@
+import asyncio  # For the delivery event loop
+import atexit  # For flushing buffered events on shutdown
+import logging
+import threading  # For running the delivery loop beside the server
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryQueue:
+    """
+        Buffers channel layer events per group and sends them in batches.
+
+        The first event for a group starts a DELIVERY_WINDOW second timer.
+        Everything queued for that group until the timer fires goes out as
+        one `notify_batch` event. A group flushes early once it holds
+        DELIVERY_BATCH_MAX events. A lone event is sent unchanged.
+
+        The buffers live on an event loop in a background thread, so sync
+        code (consumers, views run in threads) and async views can all queue
+        without awaiting a channel layer round trip.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._timers = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="channel-delivery", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def send(self, group, event):
+        """
+            Queue `event` for `group`. Safe to call from any thread or event loop.
+        """
+        self._ensure_loop().call_soon_threadsafe(self._add, group, event)
+
+    def flush(self, timeout=5):
+        """
+            Send every buffered event now and wait for it, used on shutdown.
+        """
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._flush_all(), self._loop).result(timeout)
+
+    # Everything below runs on the delivery loop
+
+    def _add(self, group, event):
+        buffer = self._buffers.setdefault(group, [])
+        buffer.append(event)
+        window = settings.DELIVERY_WINDOW
+        if window <= 0 or len(buffer) >= settings.DELIVERY_BATCH_MAX:
+            self._flush(group)
+        elif len(buffer) == 1:
+            self._timers[group] = self._loop.call_later(window, self._flush, group)
+
+    def _flush(self, group):
+        # Taking the events off the buffer right away keeps later ones out of this batch
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        events = self._buffers.pop(group, None)
+        if events:
+            return self._loop.create_task(self._send(group, events))
+
+    async def _send(self, group, events):
+        message = events[0] if len(events) == 1 else {'type': 'notify_batch', 'events': events}
+        try:
+            await get_channel_layer().group_send(group, message)
+        except Exception:
+            logger.exception("Could not deliver %d event(s) to %s", len(events), group)
+
+    async def _flush_all(self):
+        tasks = [self._flush(group) for group in list(self._buffers)]
+        await asyncio.gather(*[task for task in tasks if task is not None])
+
+
+delivery = DeliveryQueue()
+
+
+def deliver(group, event):
+    delivery.send(group, event)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        delivery.flush()
+    except Exception:
+        logger.exception("Could not flush the buffered channel events")
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from friends.models import Friend, Friendship, FriendshipRequest
+from newsfeed.models import Comment, Post
+
+
+def count_subquery(queryset, field):
+    """
+        Correlated COUNT(*) of the rows of `queryset` whose `field` points at the outer row.
+    """
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Count('id')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def friend_count():
+    # One row per pair counts for both of its users, two directed rows count once each for their receiver
+    if Friend.objects.symmetric():
+        return (count_subquery(Friendship.objects.all(), 'user_low') +
+                count_subquery(Friendship.objects.all(), 'user_high'))
+    return count_subquery(Friend.objects.all(), 'to_user')
+
+
+# (model, counter column, expression computing its true value)
+COUNTERS = (
+    (Post, 'comment_count', lambda: count_subquery(Comment.objects.all(), 'post')),
+    (User, 'friend_count', friend_count),
+    (User, 'pending_request_count',
+     lambda: count_subquery(FriendshipRequest.objects.filter(viewed__isnull=True), 'to_user')),
+)
+
+
+class Command(BaseCommand):
+    help = "Repair drift of the denormalized comment, friend and pending request counters in primary key batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rows checked per batch")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report the drifted rows")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model, field, expression in COUNTERS:
+            repaired = 0
+            last_id = 0
+            while True:
+                batch = list(
+                    model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1]
+
+                # Only rows whose stored value differs from the true count are rewritten
+                drifted = model.objects.filter(id__in=batch).annotate(actual=expression()).exclude(
+                    **{field: F('actual')})
+                drifted_ids = list(drifted.values_list('id', flat=True))
+                if drifted_ids and not options['dry_run']:
+                    model.objects.filter(id__in=drifted_ids).update(**{field: expression()})
+                repaired += len(drifted_ids)
+
+            self.stdout.write("{}.{}: {} drifted row(s){}".format(
+                model.__name__, field, repaired, " (dry run)" if options['dry_run'] else " repaired"))
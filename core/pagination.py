@@ -0,0 +1,74 @@
+import base64  # For url-safe cursor encoding
+import json  # For cursor payload serialization
+
+from django.db.models import Q  # For building the keyset filter
+from django.utils.dateparse import parse_datetime  # For decoding cursor timestamps
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    """
+        Encode a (created_at, id) position into an opaque url-safe string.
+    """
+    payload = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+        Decode a cursor produced by `encode_cursor` back into (created_at, id).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+    if created_at is None:
+        raise InvalidCursor("Invalid cursor")
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, limit=10, date_field="created_at", id_field="id"):
+    """
+        Return one page of `queryset` ordered newest first, together with the
+        cursor of the next page (None on the last page).
+
+        Rows are located by a `(date_field, id_field) < cursor` range condition
+        instead of an OFFSET, so every page costs the same index range scan no
+        matter how deep into the table it is.
+    """
+    queryset = queryset.order_by("-{}".format(date_field), "-{}".format(id_field))
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{"{}__lt".format(date_field): created_at}) |
+            Q(**{date_field: created_at, "{}__lt".format(id_field): pk})
+        )
+
+    # Fetch one extra row to know whether another page exists
+    items = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, date_field), getattr(last, id_field))
+    return items, next_cursor
+
+
+def up_to_cursor(queryset, cursor, date_field="created_at", id_field="id"):
+    """
+        Restrict `queryset` to the rows at or before the position of `cursor`,
+        i.e. the row the cursor was made from and every older one. Bulk updates
+        bounded this way leave rows that arrived after the cursor untouched.
+    """
+    created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(**{"{}__lt".format(date_field): created_at}) |
+        Q(**{date_field: created_at, "{}__lte".format(id_field): pk})
+    )
@@ -1,20 +1,62 @@
+from asgiref.sync import sync_to_async  # Importing helper to run ORM code from async views
+from django.conf import settings  # Importing project settings
+from django.http import JsonResponse  # Importing JSON response class
 from django.shortcuts import render, redirect  # Importing necessary functions
+from django.template.loader import render_to_string  # Importing template rendering helper
 from django.urls import reverse_lazy  # Importing reverse_lazy function
 
+from core.pagination import keyset_page, InvalidCursor  # Importing keyset pagination helpers
 from friends.models import Friend  # Importing Friend model
-from newsfeed.models import Post  # Importing Post model
+from newsfeed.models import Comment, TimelineEntry  # Importing Comment and TimelineEntry models
 
 
-def home(request):
-    # Redirect to login if user is not authenticated
+def timeline_page(user, cursor=None):
+    # Fetching one page of the user's timeline with user profiles and comment previews, newest first
+    entries, next_cursor = keyset_page(TimelineEntry.objects.feed(user), cursor=cursor, limit=settings.FEED_PAGE_SIZE,
+                                       date_field='post_created_at', id_field='post_id')
+    posts = Comment.objects.attach_previews([entry.post for entry in entries])
+    return posts, next_cursor
+
+
+# Build the home page context, or None for anonymous users
+@sync_to_async
+def home_context(request):
     if not request.user.is_authenticated:
-        return redirect(reverse_lazy('accounts:login'))
+        return None
 
     # Fetching user's friends
     friends = Friend.objects.friends(request.user)
 
-    # Fetching posts with related comments and user profiles, ordered by creation time
-    posts = Post.objects.prefetch_related('comments').select_related('user__profile').order_by('-created_at')
+    # Fetching the first page of the user's timeline
+    posts, next_cursor = timeline_page(request.user)
+    return {'posts': posts, 'friends': friends, 'next_cursor': next_cursor}
+
+
+async def home(request):
+    context = await home_context(request)
+
+    # Redirect to login if user is not authenticated
+    if context is None:
+        return redirect(reverse_lazy('accounts:login'))
+
+    # Rendering home page with posts and friends, templates may still touch the database
+    return await sync_to_async(render)(request, 'home.html', context)
+
+
+def feed(request):
+    # Reject anonymous users
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+
+    # Fetching the page of the user's timeline that follows the given cursor
+    try:
+        posts, next_cursor = timeline_page(request.user, cursor=request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
 
-    # Rendering home page with posts and friends
-    return render(request, 'home.html', {'posts': posts, 'friends': friends})
+    # Returning the rendered posts and the cursor of the next page
+    return JsonResponse({
+        'status': True,
+        'html': render_to_string('includes/post-list.html', {'posts': posts}, request=request),
+        'next_cursor': next_cursor,
+    })
@@ -0,0 +1,141 @@
+import threading  # For guarding the in-process cache between worker threads
+import time  # For expiring the in-process entries
+from collections import OrderedDict  # For least recently used ordering
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+
+class FriendGraphCache:
+    """
+        Per-user adjacency sets of the friend graph.
+
+        By default the sets live in a bounded in-process LRU, so repeated
+        friends() / are_friends() calls of a request are set lookups. An
+        invalidation only reaches the process that made it, so the entries
+        expire after FRIEND_GRAPH_LOCAL_TIMEOUT seconds and other workers
+        catch up within that time. When FRIEND_GRAPH_CACHE names a cache
+        alias the sets are stored in that backend instead, so an
+        invalidation in one worker is seen by all right away.
+    """
+
+    key_prefix = "friend-graph"
+
+    def __init__(self, max_size=None, alias=None, local_timeout=None):
+        self._max_size = max_size
+        self._alias = alias
+        self._local_timeout = local_timeout
+        self._local = OrderedDict()  # {user_id: (friend ids, expiry on the monotonic clock)}
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        return getattr(settings, 'FRIEND_GRAPH_CACHE_SIZE', 10000)
+
+    @property
+    def local_timeout(self):
+        if self._local_timeout is not None:
+            return self._local_timeout
+        return getattr(settings, 'FRIEND_GRAPH_LOCAL_TIMEOUT', 5)
+
+    @property
+    def shared(self):
+        alias = self._alias if self._alias is not None else getattr(settings, 'FRIEND_GRAPH_CACHE', None)
+        return caches[alias] if alias else None
+
+    def key(self, user_id):
+        return "{}:{}".format(self.key_prefix, user_id)
+
+    def get(self, user_id, load):
+        """
+            Return the frozenset of friend ids of `user_id`, calling `load` on a miss.
+        """
+        shared = self.shared
+        if shared is not None:
+            ids = shared.get(self.key(user_id))
+            if ids is None:
+                ids = frozenset(load())
+                shared.set(self.key(user_id), ids, getattr(settings, 'FRIEND_GRAPH_CACHE_TIMEOUT', 300))
+            return ids
+
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None:
+                ids, expires = entry
+                if expires > time.monotonic():
+                    self._local.move_to_end(user_id)
+                    return ids
+                del self._local[user_id]
+
+        ids = frozenset(load())
+        with self._lock:
+            self._local[user_id] = (ids, time.monotonic() + self.local_timeout)
+            self._local.move_to_end(user_id)
+            # Evict the least recently used users past the size bound
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+        return ids
+
+    def invalidate(self, *user_ids):
+        shared = self.shared
+        if shared is not None:
+            shared.delete_many([self.key(user_id) for user_id in user_ids])
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+
+    def invalidate_on_commit(self, *user_ids):
+        """
+            Drop the sets now and once more after the surrounding transaction
+            commits, so a reader that refilled them from the pre-commit state
+            does not keep a stale set.
+        """
+        self.invalidate(*user_ids)
+        transaction.on_commit(lambda: self.invalidate(*user_ids))
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def __len__(self):
+        return len(self._local)
+
+
+friend_graph = FriendGraphCache()
+
+
+# Summary of the latest friend graph report shown on the users info page
+GRAPH_REPORT_CACHE_KEY = "friend-graph:report"
+
+
+def suggestions_key(user_id):
+    return "friend-suggestions:{}".format(user_id)
+
+
+def invalidate_suggestions(*user_ids):
+    cache.delete_many([suggestions_key(user_id) for user_id in user_ids])
+
+
+def unread_notifications_key(user_id):
+    return "notifications:unread:{}".format(user_id)
+
+
+def adjust_unread_notifications(user_id, delta):
+    """
+        Atomically move the cached unread counter of a user by `delta`. A
+        missing counter is left missing, the next read rebuilds it.
+    """
+    if not delta:
+        return
+    key = unread_notifications_key(user_id)
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        return
+    # A counter gone negative has drifted, drop it so the next read recounts
+    if value < 0:
+        cache.delete(key)
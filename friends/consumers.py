@@ -50,7 +50,7 @@ class FriendRequestConsumer(AsyncJsonWebsocketConsumer):
             'actor': serializers.serialize('json', [notification.actor]),
             'recipient': serializers.serialize('json', [notification.recipient]),
             'verb': notification.verb,
-            'created_at': str(notification.timestamp)
+            'created_at': str(notification.created_at)
         }
 
     # Function called when a WebSocket connection is established
@@ -78,6 +78,10 @@ class FriendRequestConsumer(AsyncJsonWebsocketConsumer):
     async def notify(self, event):
         await self.send_json(event)  # Sending notifications in JSON format
 
+    # Function to handle notifications batched by core.delivery
+    async def notify_batch(self, event):
+        await self.send_json({'command': 'batch', 'events': event['events']})  # One frame for the whole batch
+
     # Function to handle anonymous user event
     async def anonymous_user(self, event):
         await self.send_json(event)  # Sending an anonymous user event
@@ -0,0 +1,143 @@
+import hashlib  # For the per-user friend list digests
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from friends.models import Friend
+
+
+class FriendGraph:
+    """
+        The friend graph as a symmetric CSR adjacency matrix over dense user
+        indices. `user_ids[i]` is the user id of row/column `i`.
+    """
+
+    def __init__(self, user_ids, adjacency):
+        self.user_ids = user_ids
+        self.adjacency = adjacency
+        self.index = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+
+    @classmethod
+    def load(cls, chunk_size=100000):
+        """
+            Export the friend edge list into two int64 arrays, streaming the rows
+            so the queryset never holds model instances.
+        """
+        sources, targets = [], []
+        chunk = []
+        for edge in Friend.objects.edge_list(chunk_size=chunk_size):
+            chunk.append(edge)
+            if len(chunk) >= chunk_size:
+                array = np.asarray(chunk, dtype=np.int64)
+                sources.append(array[:, 0])
+                targets.append(array[:, 1])
+                chunk = []
+        if chunk:
+            array = np.asarray(chunk, dtype=np.int64)
+            sources.append(array[:, 0])
+            targets.append(array[:, 1])
+
+        if not sources:
+            return cls(np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=np.int32))
+
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+
+        # Map user ids onto 0..n-1 so the matrix has no empty rows for unused ids
+        user_ids, inverse = np.unique(np.concatenate([sources, targets]), return_inverse=True)
+        rows, cols = inverse[:len(sources)], inverse[len(sources):]
+        n = len(user_ids)
+        adjacency = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, n))
+        # Duplicate edges would be summed, clamp them back to one
+        adjacency.data[:] = 1
+        adjacency.sort_indices()
+        return cls(user_ids, adjacency)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def friends_of(self, i):
+        start, end = self.adjacency.indptr[i], self.adjacency.indptr[i + 1]
+        return self.adjacency.indices[start:end]
+
+    def degrees(self):
+        return np.diff(self.adjacency.indptr)
+
+    def degree_histogram(self):
+        """
+            [(low, high, users), ...] of the degrees bucketed by powers of two,
+            so the report stays small whatever the largest degree is.
+        """
+        degrees = self.degrees()
+        if not len(degrees):
+            return []
+        buckets = np.floor(np.log2(degrees)).astype(np.int64)
+        counts = np.bincount(buckets)
+        return [(2 ** b, 2 ** (b + 1) - 1, int(count)) for b, count in enumerate(counts.tolist()) if count]
+
+    def components(self):
+        """
+            (number of components, sizes sorted largest first) of the graph.
+        """
+        if not len(self):
+            return 0, np.empty(0, dtype=np.int64)
+        count, labels = csgraph.connected_components(self.adjacency, directed=False)
+        return count, np.sort(np.bincount(labels))[::-1]
+
+    def hubs(self, n):
+        """
+            [(user_id, degree), ...] of the `n` most connected users.
+        """
+        degrees = self.degrees()
+        n = min(n, len(degrees))
+        if not n:
+            return []
+        top = np.argpartition(-degrees, n - 1)[:n]
+        top = top[np.lexsort((self.user_ids[top], -degrees[top]))]
+        return list(zip(self.user_ids[top].tolist(), degrees[top].tolist()))
+
+    def digests(self):
+        """
+            {user_id: digest} of every user's sorted friend list.
+        """
+        result = {}
+        for i, user_id in enumerate(self.user_ids.tolist()):
+            friends = self.user_ids[self.friends_of(i)]
+            result[user_id] = hashlib.blake2b(friends.tobytes(), digest_size=8).hexdigest()
+        return result
+
+    def affected(self, changed_ids):
+        """
+            Dense indices of the users whose friend-of-friend scores depend on
+            the friend lists of `changed_ids`: the users themselves and their friends.
+        """
+        changed = np.fromiter(
+            (self.index[user_id] for user_id in changed_ids if user_id in self.index), dtype=np.int64
+        )
+        if not len(changed):
+            return changed
+        neighbours = self.adjacency[changed].indices
+        return np.unique(np.concatenate([changed, neighbours]))
+
+    def top_k(self, rows, k):
+        """
+            Yield (user_id, [(candidate_id, mutual_friends), ...]) for the given
+            dense rows. The scores are the rows of A·A, computed for a slice of
+            rows at a time, minus the users' own friends and themselves.
+        """
+        scores = self.adjacency[rows] @ self.adjacency
+        scores = scores.tocsr()
+        for offset, i in enumerate(rows):
+            start, end = scores.indptr[offset], scores.indptr[offset + 1]
+            candidates = scores.indices[start:end]
+            counts = scores.data[start:end]
+
+            # Drop the user and the users already friends with them
+            keep = ~np.isin(candidates, self.friends_of(i), assume_unique=True) & (candidates != i)
+            candidates, counts = candidates[keep], counts[keep]
+
+            # Highest count first, lowest user id breaks ties
+            candidate_ids = self.user_ids[candidates]
+            order = np.lexsort((candidate_ids, -counts))[:k]
+            yield int(self.user_ids[i]), list(zip(candidate_ids[order].tolist(), counts[order].tolist()))
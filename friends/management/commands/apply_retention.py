@@ -0,0 +1,84 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from accounts.models import User
+from core.counters import adjust
+from friends.cache import adjust_unread_notifications, invalidate_suggestions
+from friends.models import CustomNotification, Friend
+
+
+def delete_notifications(chunk):
+    # Pruned unread notifications leave the cached unread counters of their recipients
+    unread = chunk.filter(is_read=False).order_by().values_list('recipient_id').annotate(total=Count('id'))
+    unread = list(unread)
+    deleted, _ = chunk.delete()
+    for recipient_id, total in unread:
+        transaction.on_commit(lambda recipient_id=recipient_id, total=total:
+                              adjust_unread_notifications(recipient_id, -total))
+    return deleted
+
+
+def delete_requests(chunk):
+    # Requests never viewed still count as pending for their receiver
+    pending = chunk.filter(viewed__isnull=True).order_by().values_list('to_user_id').annotate(total=Count('id'))
+    by_total = defaultdict(list)
+    for to_user_id, total in pending:
+        by_total[total].append(to_user_id)
+    user_ids = set(chunk.values_list('from_user_id', flat=True)) | set(chunk.values_list('to_user_id', flat=True))
+    deleted, _ = chunk.delete()
+    for total, to_user_ids in by_total.items():
+        adjust(User.objects.filter(id__in=to_user_ids), pending_request_count=-total)
+    # The users can suggest each other again
+    transaction.on_commit(lambda: invalidate_suggestions(*user_ids))
+    return deleted
+
+
+class Command(BaseCommand):
+    help = "Delete the notifications and rejected friend requests past their retention period in primary key chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Number of rows deleted per transaction")
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help="Seconds to sleep between chunks so other writers get the database lock")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count the expired rows")
+
+    def handle(self, *args, **options):
+        targets = (
+            ('notifications', CustomNotification.objects.expired(), delete_notifications),
+            ('rejected friend requests', Friend.objects.expired_requests(), delete_requests),
+        )
+        for label, expired, delete in targets:
+            if options['dry_run']:
+                self.stdout.write("{}: {} expired row(s) (dry run)".format(label, expired.count()))
+                continue
+            started = time.monotonic()
+            reclaimed, chunks = self.prune(expired, delete, options['chunk_size'], options['pause'])
+            self.stdout.write("{}: {} row(s) reclaimed in {} chunk(s), {:.1f}s".format(
+                label, reclaimed, chunks, time.monotonic() - started))
+
+    @staticmethod
+    def prune(expired, delete, chunk_size, pause):
+        """
+            Delete the rows of `expired` one primary key range of at most
+            `chunk_size` rows at a time, each range in its own short transaction.
+        """
+        reclaimed = chunks = 0
+        last_id = 0
+        while True:
+            ids = list(expired.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return reclaimed, chunks
+            last_id = ids[-1]
+
+            # The range is bounded by the ids just read, the expiry filter still applies inside it
+            with transaction.atomic():
+                reclaimed += delete(expired.filter(id__gte=ids[0], id__lte=last_id))
+            chunks += 1
+            if pause:
+                time.sleep(pause)
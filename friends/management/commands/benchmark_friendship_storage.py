@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+
+from friends.models import Friend, Friendship
+
+
+def storage_size(model):
+    """
+        Bytes used by the table of `model` and its indexes, None if the database cannot tell.
+    """
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                return cursor.fetchone()[0]
+            if connection.vendor == 'sqlite':
+                # dbstat reports every b-tree, the table's indexes are listed in sqlite_master
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+                return cursor.fetchone()[0]
+    except DatabaseError:
+        pass
+    return None
+
+
+def timed(function, arguments):
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(*argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]
+
+
+class Command(BaseCommand):
+    help = "Compare table size and query latency of the directed and symmetric friendship layouts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200,
+                            help="Number of users (and pairs) queried per measurement")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        directed_rows = Friend.objects.count()
+        symmetric_rows = Friendship.objects.count()
+        if not directed_rows or not symmetric_rows:
+            self.stderr.write("Both layouts need data, run convert_friendships without --prune first")
+            return
+
+        rng = random.Random(options['seed'])
+        pairs = list(Friend.objects.order_by().values_list('to_user_id', 'from_user_id')[:options['samples'] * 10])
+        pairs = rng.sample(pairs, min(options['samples'], len(pairs)))
+        users = [(user_id,) for user_id, _ in pairs]
+
+        self.stdout.write("{:<12}{:>12}{:>14}".format("layout", "rows", "bytes"))
+        for name, model, rows in (('directed', Friend, directed_rows), ('symmetric', Friendship, symmetric_rows)):
+            size = storage_size(model)
+            self.stdout.write("{:<12}{:>12}{:>14}".format(name, rows, size if size is not None else "n/a"))
+
+        self.stdout.write("")
+        self.stdout.write("{:<12}{:<16}{:>12}{:>12}".format("layout", "query", "median ms", "p95 ms"))
+        for layout in ('directed', 'symmetric'):
+            with override_settings(FRIENDSHIP_STORAGE=layout):
+                if layout == 'symmetric':
+                    def friend_ids(user_id):
+                        return Friendship.objects.friend_ids(user_id)
+                else:
+                    def friend_ids(user_id):
+                        return list(Friend.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True))
+
+                def are_friends(user1_id, user2_id):
+                    return Friend.objects.friendship_rows(user1_id, user2_id).exists()
+
+                def mutual_counts(user_id):
+                    ids = friend_ids(user_id)
+                    return Friend.objects.mutual_friend_counts(ids, set(ids) | {user_id}, 50)
+
+                for query, function, arguments in (
+                        ('friend ids', friend_ids, users),
+                        ('are friends', are_friends, pairs),
+                        ('mutual counts', mutual_counts, users)):
+                    median, p95 = timed(function, arguments)
+                    self.stdout.write("{:<12}{:<16}{:>12.3f}{:>12.3f}".format(layout, query, median, p95))
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from friends.graph import FriendGraph
+from friends.models import FriendRecommendation, RecommendationState
+
+
+class Command(BaseCommand):
+    help = "Precompute the top friend-of-friend recommendations of every user from the friend graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.FRIEND_RECOMMENDATIONS_TOP_K,
+                            help="Number of recommendations stored per user")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of users scored per sparse matrix product")
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute every user instead of only those whose friend graph changed")
+
+    def handle(self, *args, **options):
+        graph = FriendGraph.load()
+        digests = graph.digests()
+        states = dict(RecommendationState.objects.values_list('user_id', 'edges_digest'))
+
+        batch_size = options['batch_size']
+
+        # Users who lost all their friends have no recommendations left, cleared in chunks so no
+        # statement binds more ids than the database accepts
+        gone = [user_id for user_id in states if user_id not in digests]
+        for start in range(0, len(gone), batch_size):
+            chunk = gone[start:start + batch_size]
+            with transaction.atomic():
+                FriendRecommendation.objects.filter(user_id__in=chunk).delete()
+                RecommendationState.objects.filter(user_id__in=chunk).delete()
+
+        if options['full']:
+            rows = list(range(len(graph)))
+        else:
+            changed = [user_id for user_id, digest in digests.items() if states.get(user_id) != digest]
+            rows = graph.affected(changed).tolist()
+
+        written = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            now = timezone.now()
+            recommendations, user_ids = [], []
+            for user_id, ranked in graph.top_k(batch, options['top_k']):
+                user_ids.append(user_id)
+                recommendations.extend(
+                    FriendRecommendation(user_id=user_id, candidate_id=candidate_id, score=score,
+                                         rank=rank, computed_at=now)
+                    for rank, (candidate_id, score) in enumerate(ranked)
+                )
+
+            # Swap the rows of the batch at once so readers never see a half written list
+            with transaction.atomic():
+                FriendRecommendation.objects.filter(user_id__in=user_ids).delete()
+                FriendRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+                RecommendationState.objects.filter(user_id__in=user_ids).delete()
+                RecommendationState.objects.bulk_create(
+                    [RecommendationState(user_id=user_id, edges_digest=digests[user_id], computed_at=now)
+                     for user_id in user_ids],
+                    batch_size=1000,
+                )
+            written += len(recommendations)
+            if options['verbosity'] > 1:
+                self.stdout.write("Scored {} of {} user(s)".format(min(start + batch_size, len(rows)), len(rows)))
+
+        if options['full']:
+            # Every user of the graph has a state row now, recommendations of anyone else are orphans
+            FriendRecommendation.objects.exclude(user_id__in=RecommendationState.objects.values('user_id')).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            "Recomputed {} user(s), {} recommendation(s), cleared {} user(s)".format(len(rows), written, len(gone))
+        ))
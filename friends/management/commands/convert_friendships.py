@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from friends import storage
+from friends.cache import friend_graph
+from friends.models import Friend, Friendship
+
+
+class Command(BaseCommand):
+    help = "Copy the friendships into the directed (two Friend rows) or symmetric (one Friendship row) layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['symmetric', 'directed'], required=True,
+                            help="Layout to copy the friendships into")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of source rows copied per batch")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete the rows of the source layout once they are copied")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['to'] == 'symmetric':
+            source, target, copy = Friend, Friendship, storage.collapse
+        else:
+            source, target, copy = Friendship, Friend, storage.expand
+
+        # Rebuild the target from scratch so friendships removed since an earlier copy do not come back
+        cleared = storage.prune(target, batch_size)
+        copied = copy(Friend, Friendship, batch_size)
+        self.stdout.write("Cleared {} {} row(s), copied {} friendship(s)".format(
+            cleared, target.__name__, copied))
+
+        if options['prune']:
+            pruned = storage.prune(source, batch_size)
+            self.stdout.write("Deleted {} {} row(s)".format(pruned, source.__name__))
+
+        friend_graph.clear()
+        self.stdout.write(self.style.SUCCESS(
+            "Friendships copied, set FRIENDSHIP_STORAGE = '{}' to read them".format(options['to'])
+        ))
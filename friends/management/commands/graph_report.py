@@ -0,0 +1,95 @@
+import csv
+import json
+import sys
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import User
+from friends.cache import GRAPH_REPORT_CACHE_KEY
+from friends.graph import FriendGraph
+from friends.models import GraphReport
+
+
+def summarize(graph, top):
+    degrees = graph.degrees()
+    component_count, component_sizes = graph.components()
+    hubs = graph.hubs(top)
+    usernames = dict(User.objects.filter(id__in=[user_id for user_id, _ in hubs]).values_list('id', 'username'))
+    users = User.objects.filter(is_active=True).count()
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'users': users,
+        'connected_users': len(graph),
+        'isolated_users': max(users - len(graph), 0),
+        'friendships': int(degrees.sum()) // 2,
+        'degree': {
+            'mean': round(float(degrees.mean()), 2) if len(degrees) else 0,
+            'median': float(np.median(degrees)) if len(degrees) else 0,
+            'p99': float(np.percentile(degrees, 99)) if len(degrees) else 0,
+            'max': int(degrees.max()) if len(degrees) else 0,
+        },
+        'degree_histogram': [
+            {'low': low, 'high': high, 'users': count} for low, high, count in graph.degree_histogram()
+        ],
+        'components': {
+            'count': int(component_count),
+            'largest': component_sizes[:top].tolist(),
+        },
+        'hubs': [
+            {'user_id': user_id, 'username': usernames.get(user_id), 'degree': degree} for user_id, degree in hubs
+        ],
+    }
+
+
+def write_csv(summary, stream):
+    writer = csv.writer(stream)
+    writer.writerow(['section', 'key', 'value'])
+    for key in ('generated_at', 'users', 'connected_users', 'isolated_users', 'friendships'):
+        writer.writerow(['graph', key, summary[key]])
+    for key, value in summary['degree'].items():
+        writer.writerow(['degree', key, value])
+    for bucket in summary['degree_histogram']:
+        writer.writerow(['degree_histogram', "{}-{}".format(bucket['low'], bucket['high']), bucket['users']])
+    writer.writerow(['components', 'count', summary['components']['count']])
+    for rank, size in enumerate(summary['components']['largest'], start=1):
+        writer.writerow(['components', "largest_{}".format(rank), size])
+    for hub in summary['hubs']:
+        writer.writerow(['hubs', hub['username'] or hub['user_id'], hub['degree']])
+
+
+class Command(BaseCommand):
+    help = "Report degree distribution, connected components, isolated users and hubs of the friend graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['json', 'csv'], default='json')
+        parser.add_argument('--output', default='-',
+                            help="File to write the report to, standard output by default")
+        parser.add_argument('--top', type=int, default=10,
+                            help="Number of largest components and hubs listed")
+        parser.add_argument('--chunk-size', type=int, default=100000,
+                            help="Number of edges held in memory while exporting")
+        parser.add_argument('--no-save', action='store_true',
+                            help="Do not store the summary shown on the users info page")
+
+    def handle(self, *args, **options):
+        graph = FriendGraph.load(chunk_size=options['chunk_size'])
+        summary = summarize(graph, options['top'])
+
+        if not options['no_save']:
+            GraphReport.objects.create(summary=summary)
+            cache.delete(GRAPH_REPORT_CACHE_KEY)
+
+        stream = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='')
+        try:
+            if options['format'] == 'csv':
+                write_csv(summary, stream)
+            else:
+                json.dump(summary, stream, indent=2)
+                stream.write("\n")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,47 @@
+# Generated by Django 4.0 on 2026-10-17 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_counters'),
+        ('friends', '0007_alter_friend_options_rename_user_friend_from_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='accounts.user')),
+                ('edges_digest', models.CharField(max_length=16)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FriendRecommendation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.user')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_recommendations', to='accounts.user')),
+            ],
+            options={
+                'verbose_name': 'Friend Recommendation',
+                'verbose_name_plural': 'Friend Recommendations',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='friendrecommendation',
+            index=models.Index(fields=['user', 'rank'], name='friends_recommendation_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendrecommendation',
+            unique_together={('user', 'candidate')},
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.0 on 2026-10-17 20:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.utils.timezone
+
+from friends import storage
+
+
+def collapse_friends(apps, schema_editor):
+    # Deployments staying on the directed layout switch later with the convert_friendships command
+    if settings.FRIENDSHIP_STORAGE != 'symmetric':
+        return
+    storage.collapse(apps.get_model('friends', 'Friend'), apps.get_model('friends', 'Friendship'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_counters'),
+        ('friends', '0008_friend_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.user')),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.user')),
+            ],
+            options={
+                'verbose_name': 'Friendship',
+                'verbose_name_plural': 'Friendships',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['user_high', 'user_low'], name='friends_friendship_high_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='friends_friendship_pair_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.CheckConstraint(check=models.Q(('user_low__lt', django.db.models.expressions.F('user_high'))), name='friends_friendship_ordered'),
+        ),
+        migrations.RunPython(collapse_friends, migrations.RunPython.noop),
+    ]
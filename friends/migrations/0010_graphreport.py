@@ -0,0 +1,27 @@
+# Generated by Django 4.0 on 2026-10-17 20:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0009_friendship'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphReport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.JSONField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Graph Report',
+                'verbose_name_plural': 'Graph Reports',
+                'get_latest_by': 'created_at',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0 on 2026-10-17 20:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0010_graphreport'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customnotification',
+            options={'verbose_name': 'Notification', 'verbose_name_plural': 'Notifications'},
+        ),
+        migrations.RenameField(
+            model_name='customnotification',
+            old_name='timestamp',
+            new_name='created_at',
+        ),
+        migrations.AlterField(
+            model_name='customnotification',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='customnotification',
+            name='is_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='customnotification',
+            index=models.Index(fields=['recipient', 'is_read', 'created_at'], name='friends_notification_inbox_idx'),
+        ),
+    ]
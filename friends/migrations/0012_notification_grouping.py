@@ -0,0 +1,44 @@
+# Generated by Django 4.0 on 2026-10-17 20:08
+
+from django.db import migrations, models
+
+
+def fill_latest_actors(apps, schema_editor):
+    CustomNotification = apps.get_model('friends', 'CustomNotification')
+    last_id = 0
+    while True:
+        batch = list(
+            CustomNotification.objects.filter(id__gt=last_id).select_related('actor').order_by('id')[:1000]
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+        for notification in batch:
+            actor = notification.actor
+            notification.latest_actors = [{
+                'id': actor.id,
+                'username': actor.username,
+                'name': "{} {}".format(actor.first_name, actor.last_name).strip(),
+            }]
+        CustomNotification.objects.bulk_update(batch, ['latest_actors'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0011_customnotification_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customnotification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='customnotification',
+            name='latest_actors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(fill_latest_actors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.0 on 2026-10-17 20:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_actors(apps, schema_editor):
+    """
+        Record the actors known for the existing notifications: the latest
+        actors and the notification's own actor. Works in primary key batches.
+    """
+    CustomNotification = apps.get_model('friends', 'CustomNotification')
+    NotificationActor = apps.get_model('friends', 'NotificationActor')
+    User = apps.get_model('accounts', 'User')
+    last_id = 0
+    while True:
+        batch = list(
+            CustomNotification.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'actor_id', 'latest_actors')[:1000]
+        )
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        pairs = set()
+        for notification_id, actor_id, latest_actors in batch:
+            pairs.add((notification_id, actor_id))
+            pairs.update((notification_id, entry['id']) for entry in latest_actors or [])
+        # Latest actors may name accounts deleted since
+        existing = set(User.objects.filter(id__in={actor_id for _, actor_id in pairs}).values_list('id', flat=True))
+        NotificationActor.objects.bulk_create(
+            [NotificationActor(notification_id=notification_id, actor_id=actor_id)
+             for notification_id, actor_id in pairs if actor_id in existing],
+            batch_size=1000, ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_counters'),
+        ('friends', '0012_notification_grouping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.user')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='friends.customnotification')),
+            ],
+            options={
+                'unique_together': {('notification', 'actor')},
+            },
+        ),
+        migrations.RunPython(fill_actors, migrations.RunPython.noop),
+    ]
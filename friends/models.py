@@ -1,43 +1,219 @@
 # Import necessary Django modules and classes
+from collections import Counter
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db import models
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Count, F, Q
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 
 # Import custom exceptions and signals related to friendship
 from friends.exceptions import AlreadyFriendsError, AlreadyExistsError
 from friends.signals import friendship_request_created, friendship_removed, friendship_request_viewed, \
-    friendship_request_canceled, friendship_request_accepted
+    friendship_requests_viewed, friendship_request_canceled, friendship_request_accepted
 
 # Import User model from accounts
 from accounts.models import User
+from core.contants.common import RELATIONSHIP_NONE, RELATIONSHIP_FRIEND, RELATIONSHIP_REQUEST_SENT, \
+    RELATIONSHIP_REQUEST_RECEIVED, RELATIONSHIP_REJECTED
+from core.counters import adjust
+from core.pagination import up_to_cursor
+from friends.cache import GRAPH_REPORT_CACHE_KEY, adjust_unread_notifications, friend_graph, invalidate_suggestions, \
+    unread_notifications_key
 
 # Define a manager for handling notifications
 class NotificationManager(models.Manager):
 
-    # Method to get the count of unread notifications for a user
+    # Method to get the count of unread notifications for a user, from the cached counter when it exists
     def user_unread_notification_count(self, user) -> int:
         if not user:
             return 0
-        return self.filter(is_read=False, recipient=user).count()
+        key = unread_notifications_key(user.id)
+        count = cache.get(key)
+        if count is None:
+            count = self.filter(is_read=False, recipient=user).count()
+            # add() keeps a counter another worker rebuilt and incremented in the meantime
+            cache.add(key, count, settings.NOTIFICATION_UNREAD_TIMEOUT)
+        return count
+
+    # Method to mark the unread notifications of a user as read, optionally only those matching `filters`
+    # and, given an inbox cursor, only those at or before it
+    def mark_read(self, user, cursor=None, **filters):
+        qs = self.filter(recipient=user, is_read=False, **filters)
+        if cursor:
+            qs = up_to_cursor(qs, cursor)
+        with transaction.atomic():
+            updated = qs.update(is_read=True)
+            if updated:
+                transaction.on_commit(lambda: adjust_unread_notifications(user.id, -updated))
+        return updated
+
+    # Method to retrieve the inbox of a user, newest first, optionally only the unread notifications
+    def inbox(self, user, unread_only=False):
+        qs = self.select_related('actor').filter(recipient=user)
+        if unread_only:
+            qs = qs.filter(is_read=False)
+        return qs.order_by('-created_at', '-id')
+
+    # Method to record that `actor` did `verb` on `target`, folding it into a recent unread notification of the same kind
+    def notify(self, recipient, actor, verb, target, action):
+        """
+            Group notifications by (recipient, verb, target) within
+            NOTIFICATION_COALESCE_WINDOW seconds of the group's latest event.
+            A grouped event moves the existing row to the top, counts its actor
+            and keeps the last NOTIFICATION_LATEST_ACTORS of them instead of
+            inserting a row. Returns (notification, created).
+        """
+        content_type = ContentType.objects.get_for_model(target)
+        now = timezone.now()
+        window_start = now - timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW)
+        actor_entry = {'id': actor.id, 'username': actor.username, 'name': actor.get_full_name()}
+
+        with transaction.atomic():
+            notification = (
+                self.select_for_update()
+                    .filter(recipient=recipient, is_read=False, created_at__gte=window_start, verb=verb,
+                            content_type=content_type, object_id=target.pk)
+                    .order_by('-created_at')
+                    .first()
+            )
+            if notification is None:
+                notification = self.create(
+                    recipient=recipient, actor=actor, verb=verb, target=target, created_at=now,
+                    description=action, latest_actors=[actor_entry],
+                )
+                NotificationActor.objects.create(notification=notification, actor=actor)
+                transaction.on_commit(lambda: adjust_unread_notifications(recipient.id, 1))
+                return notification, True
+
+            # Only actors the group has never seen are counted, the row lock keeps this check race free
+            _, new_actor = NotificationActor.objects.get_or_create(notification=notification, actor=actor)
+            if new_actor:
+                notification.actor_count += 1
+            latest = [entry for entry in notification.latest_actors if entry['id'] != actor.id]
+            notification.latest_actors = ([actor_entry] + latest)[:settings.NOTIFICATION_LATEST_ACTORS]
+            notification.actor = actor
+            notification.created_at = now
+            others = notification.actor_count - 1
+            notification.description = "and {} other{} {}".format(others, "s" if others > 1 else "", action) \
+                if others else action
+            notification.save(update_fields=['actor', 'actor_count', 'latest_actors', 'created_at', 'description'])
+            return notification, False
+
+    # Method to retrieve the notifications past their retention period, see NOTIFICATION_RETENTION_DAYS
+    def expired(self, now=None):
+        now = now or timezone.now()
+        policies = settings.NOTIFICATION_RETENTION_DAYS
+        # Read and dismissed notifications expire per verb, verbs without a policy use the default
+        read_expired = Q()
+        for verb, days in policies.items():
+            if days is not None:
+                read_expired |= Q(verb=verb, created_at__lt=now - timedelta(days=days))
+        default_days = settings.NOTIFICATION_DEFAULT_RETENTION_DAYS
+        if default_days is not None:
+            read_expired |= Q(created_at__lt=now - timedelta(days=default_days)) & ~Q(verb__in=list(policies))
+        expired = read_expired & (Q(is_read=True) | Q(deleted=True)) if read_expired else Q()
+        # Notifications never read expire later whatever their verb
+        unread_days = settings.NOTIFICATION_UNREAD_RETENTION_DAYS
+        if unread_days is not None:
+            expired |= Q(is_read=False, deleted=False, created_at__lt=now - timedelta(days=unread_days))
+        if not expired:
+            return self.none()
+        return self.filter(expired)
+
+    # Method to retrieve the newest unread notifications of a user with the given verb
+    def unread(self, user, verb=None, limit=None):
+        qs = self.inbox(user, unread_only=True)
+        if verb is not None:
+            qs = qs.filter(verb=verb)
+        return qs[:limit] if limit else qs
 
 # Define a manager for handling friendships
 class FriendshipManager(models.Manager):
     """ Friendship manager """
 
+    # Method telling whether friendships are stored as one Friendship row per pair instead of two Friend rows
+    @staticmethod
+    def symmetric():
+        return settings.FRIENDSHIP_STORAGE == 'symmetric'
+
+    # Method to retrieve the friend ids of a user from the database, bypassing the cache.
+    # Writes that last (timeline fan-out, counters) use it, a cached set may miss a change made by another worker
+    def stored_friend_ids(self, user):
+        user_id = getattr(user, 'id', user)
+        if self.symmetric():
+            return Friendship.objects.friend_ids(user_id)
+        return list(Friend.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True))
+
+    # Method to retrieve the cached set of friend ids of a user, for reads
+    def friend_id_set(self, user):
+        user_id = getattr(user, 'id', user)
+        return friend_graph.get(user_id, lambda: self.stored_friend_ids(user_id))
+
+    # Method to retrieve the rows storing the friendship of two users in the configured layout
+    def friendship_rows(self, user1, user2):
+        if self.symmetric():
+            return Friendship.objects.between(user1, user2)
+        return Friend.objects.filter(Q(to_user=user2, from_user=user1) | Q(to_user=user1, from_user=user2))
+
+    # Method to store the friendships of (user id, user id) pairs in the configured layout
+    def create_friendships(self, pairs):
+        if self.symmetric():
+            Friendship.objects.bulk_create([Friendship.for_pair(user1_id, user2_id) for user1_id, user2_id in pairs])
+            return
+        Friend.objects.bulk_create(
+            [Friend(from_user_id=user1_id, to_user_id=user2_id) for user1_id, user2_id in pairs] +
+            [Friend(from_user_id=user2_id, to_user_id=user1_id) for user1_id, user2_id in pairs]
+        )
+
+    # Method to iterate over every (user id, friend id) edge, both directions of each friendship included
+    def edge_list(self, chunk_size=10000):
+        if self.symmetric():
+            pairs = Friendship.objects.order_by().values_list('user_low_id', 'user_high_id')
+            for low_id, high_id in pairs.iterator(chunk_size=chunk_size):
+                yield low_id, high_id
+                yield high_id, low_id
+            return
+        yield from Friend.objects.order_by().values_list('to_user_id', 'from_user_id').iterator(chunk_size=chunk_size)
+
+    # Method to count, for the friends of friends outside `excluded`, how many of `friend_ids` they are friends with
+    def mutual_friend_counts(self, friend_ids, excluded, limit):
+        if self.symmetric():
+            counts = Counter()
+            for own, other in (('user_low_id', 'user_high_id'), ('user_high_id', 'user_low_id')):
+                counts.update(dict(
+                    Friendship.objects.filter(**{own + '__in': friend_ids})
+                        .exclude(**{other + '__in': excluded})
+                        .values(other)
+                        .annotate(mutual=Count('id'))
+                        .values_list(other, 'mutual')
+                ))
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return list(
+            Friend.objects.filter(from_user_id__in=friend_ids)
+                .exclude(to_user_id__in=excluded)
+                .values('to_user_id')
+                .annotate(mutual=Count('id'))
+                .order_by('-mutual', 'to_user_id')
+                .values_list('to_user_id', 'mutual')[:limit]
+        )
+
     # Method to retrieve a list of all friends for a user
     def friends(self, user):
-        qs = (
-            Friend.objects.select_related("from_user", "to_user")
-                .filter(to_user=user)
-                .all()
-        )
-        friends = [u.from_user for u in qs]
-        return friends
+        ids = self.friend_id_set(user)
+        if not ids:
+            return []
+        return list(User.objects.filter(id__in=ids))
+
+    # Method to retrieve the ids of all friends for a user
+    def friend_ids(self, user):
+        return list(self.friend_id_set(user))
 
     # Method to retrieve a list of friendship requests for a user
     def requests(self, user):
@@ -69,6 +245,19 @@ class FriendshipManager(models.Manager):
         unread_requests = list(qs)
         return unread_requests
 
+    # Method to mark the unviewed friendship requests a user received as viewed, given a cursor only those
+    # at or before it, with one UPDATE and one friendship_requests_viewed signal for all of them
+    def mark_requests_viewed(self, user, cursor=None):
+        qs = FriendshipRequest.objects.filter(to_user=user, viewed__isnull=True)
+        if cursor:
+            qs = up_to_cursor(qs, cursor)
+        with transaction.atomic():
+            updated = qs.update(viewed=timezone.now())
+            adjust(User.objects.filter(id=user.id), pending_request_count=-updated)
+        if updated:
+            friendship_requests_viewed.send(sender=FriendshipRequest, to_user=user, count=updated)
+        return updated
+
     # Method to retrieve a list of unread friendship requests for a user
     def unread_requests(self, user):
         qs = (
@@ -79,11 +268,10 @@ class FriendshipManager(models.Manager):
         unread_requests = list(qs)
         return unread_requests
 
-    # Method to get the count of unread friendship requests for a user
+    # Method to get the count of unread friendship requests for a user, read from the denormalized counter
     def unread_request_count(self, user):
-        count = FriendshipRequest.objects.select_related("from_user", "to_user").filter(to_user=user,
-                                                                                        viewed__isnull=True).count()
-        return count
+        count = User.objects.filter(id=user.id).values_list('pending_request_count', flat=True).first()
+        return count or 0
 
     # Method to retrieve a list of read friendship requests for a user
     def read_requests(self, user):
@@ -105,6 +293,14 @@ class FriendshipManager(models.Manager):
         rejected_requests = list(qs)
         return rejected_requests
 
+    # Method to retrieve the rejected friendship requests kept longer than FRIENDSHIP_REQUEST_REJECTED_RETENTION_DAYS
+    def expired_requests(self, now=None):
+        days = settings.FRIENDSHIP_REQUEST_REJECTED_RETENTION_DAYS
+        if days is None:
+            return FriendshipRequest.objects.none()
+        now = now or timezone.now()
+        return FriendshipRequest.objects.filter(rejected__lt=now - timedelta(days=days))
+
     # Method to retrieve a list of unrejected friendship requests for a user
     def unrejected_requests(self, user):
         qs = (
@@ -121,29 +317,69 @@ class FriendshipManager(models.Manager):
                                                                                         rejected__isnull=True).count()
         return count
 
+    # Method to resolve the relationship of each of the given users to a user
+    def relationship_statuses(self, user, user_ids):
+        """
+            Return {user_id: status} for `user_ids` as seen by `user`, using the
+            cached friend set and a single query for the requests in either
+            direction, whatever the number of ids.
+        """
+        user_ids = set(user_ids)
+        user_ids.discard(user.id)
+        friend_ids = self.friend_id_set(user)
+        statuses = {
+            user_id: RELATIONSHIP_FRIEND if user_id in friend_ids else RELATIONSHIP_NONE for user_id in user_ids
+        }
+
+        pending_ids = [user_id for user_id, status in statuses.items() if status == RELATIONSHIP_NONE]
+        if pending_ids:
+            requests = FriendshipRequest.objects.filter(
+                Q(from_user=user, to_user_id__in=pending_ids) | Q(to_user=user, from_user_id__in=pending_ids)
+            ).values_list('from_user_id', 'to_user_id', 'rejected')
+            for from_user_id, to_user_id, rejected in requests:
+                other_id = to_user_id if from_user_id == user.id else from_user_id
+                # A rejection in either direction wins over a request in the other one
+                if statuses[other_id] == RELATIONSHIP_REJECTED:
+                    continue
+                if rejected is not None:
+                    statuses[other_id] = RELATIONSHIP_REJECTED
+                elif from_user_id == user.id:
+                    statuses[other_id] = RELATIONSHIP_REQUEST_SENT
+                else:
+                    statuses[other_id] = RELATIONSHIP_REQUEST_RECEIVED
+        return statuses
+
     # Method to create a friendship request between two users
     def add_friend(self, from_user, to_user, message=None):
         if from_user == to_user:
             raise ValidationError("Users cannot be friends with themselves")
 
-        if self.are_friends(from_user, to_user):
+        status = self.relationship_statuses(from_user, [to_user.id])[to_user.id]
+        if status == RELATIONSHIP_FRIEND:
             raise AlreadyFriendsError("Users are already friends")
 
-        if FriendshipRequest.objects.filter(from_user=from_user, to_user=to_user).exists():
+        if status == RELATIONSHIP_REQUEST_SENT:
             raise AlreadyExistsError("You already requested friendship from this user.")
 
-        if FriendshipRequest.objects.filter(from_user=to_user, to_user=from_user).exists():
+        if status == RELATIONSHIP_REQUEST_RECEIVED:
             raise AlreadyExistsError("This user already requested friendship from you.")
 
+        if status == RELATIONSHIP_REJECTED:
+            raise AlreadyExistsError("Friendship was already requested and rejected.")
+
         if message is None:
             message = ""
 
-        request, created = FriendshipRequest.objects.get_or_create(
-            from_user=from_user, to_user=to_user
-        )
+        with transaction.atomic():
+            request, created = FriendshipRequest.objects.get_or_create(
+                from_user=from_user, to_user=to_user
+            )
 
-        if created is False:
-            raise AlreadyExistsError("Friendship already requested")
+            if created is False:
+                raise AlreadyExistsError("Friendship already requested")
+
+            # Count the new unread request of the receiver
+            adjust(User.objects.filter(id=to_user.id), pending_request_count=1)
 
         if message:
             request.message = message
@@ -153,36 +389,89 @@ class FriendshipManager(models.Manager):
 
         return request
 
+    # Method to create friendship requests from a user to many users at once
+    def add_friends(self, from_user, to_users, message=""):
+        """
+            Request friendship from every user of `to_users` who has no
+            relationship with `from_user` yet, in one transaction. Returns the
+            created requests and {username: reason} of the skipped users.
+        """
+        to_users = [to_user for to_user in to_users if to_user != from_user]
+        statuses = self.relationship_statuses(from_user, [to_user.id for to_user in to_users])
+        skipped = {
+            to_user.username: statuses[to_user.id] for to_user in to_users if statuses[to_user.id] != RELATIONSHIP_NONE
+        }
+        requests = [
+            FriendshipRequest(from_user=from_user, to_user=to_user, message=message or "")
+            for to_user in to_users if statuses[to_user.id] == RELATIONSHIP_NONE
+        ]
+        if not requests:
+            return [], skipped
+
+        with transaction.atomic():
+            FriendshipRequest.objects.bulk_create(requests)
+            adjust(User.objects.filter(id__in=[request.to_user_id for request in requests]), pending_request_count=1)
+
+        for request in requests:
+            friendship_request_created.send(sender=request)
+        return requests, skipped
+
+    # Method to accept the friendship requests a user got from many users at once
+    def accept_requests(self, to_user, from_users):
+        """
+            Accept the pending requests of `from_users` to `to_user` in one
+            transaction and return the users whose request was accepted.
+        """
+        requests = list(
+            FriendshipRequest.objects.select_related('from_user')
+                .filter(to_user=to_user, from_user__in=from_users, rejected__isnull=True)
+        )
+        if not requests:
+            return []
+
+        from_user_ids = [request.from_user_id for request in requests]
+        with transaction.atomic():
+            self.create_friendships([(request.from_user_id, to_user.id) for request in requests])
+            adjust(User.objects.filter(id__in=from_user_ids), friend_count=1)
+            adjust(User.objects.filter(id=to_user.id), friend_count=len(requests),
+                   pending_request_count=-sum(1 for request in requests if request.viewed is None))
+
+            # Requests the receiver had sent the other way are settled too
+            reverse = FriendshipRequest.objects.filter(from_user=to_user, to_user_id__in=from_user_ids)
+            adjust(User.objects.filter(id__in=reverse.filter(viewed__isnull=True).values('to_user_id')),
+                   pending_request_count=-1)
+
+            for request in requests:
+                friendship_request_accepted.send(sender=request, from_user=request.from_user, to_user=to_user)
+
+            FriendshipRequest.objects.filter(id__in=[request.id for request in requests]).delete()
+            reverse.delete()
+
+        return [request.from_user for request in requests]
+
     # Function to remove a friendship relationship between two users
     def remove_friend(self, from_user, to_user):
         """ Destroy a friendship relationship """
 
-        # Attempt to retrieve the friendships based on the given users
-        try:
-            qs = Friend.objects.filter(
-                Q(to_user=to_user, from_user=from_user) | Q(to_user=from_user, from_user=to_user))
-            distinct_qs = qs.distinct().all()
+        # Attempt to retrieve the friendship rows of the given users
+        qs = self.friendship_rows(from_user, to_user)
+        friendship = qs.first()
 
-            # If friendships exist, trigger the 'friendship_removed' signal and delete the relationships
-            if distinct_qs:
-                friendship_removed.send(
-                    sender=distinct_qs[0], from_user=from_user, to_user=to_user
-                )
-                qs.delete()
-                return True
-            else:
-                return False
-        except Friend.DoesNotExist:
+        # If the friendship exists, trigger the 'friendship_removed' signal and delete its rows
+        if friendship is None:
             return False
+        with transaction.atomic():
+            friendship_removed.send(
+                sender=friendship, from_user=from_user, to_user=to_user
+            )
+            qs.delete()
+            adjust(User.objects.filter(id__in=[from_user.id, to_user.id]), friend_count=-1)
+        return True
 
     # Method to check if two users are friends
     def are_friends(self, user1, user2):
         """ Are these two users friends? """
-        try:
-            Friend.objects.get(to_user=user1, from_user=user2)
-            return True
-        except Friend.DoesNotExist:
-            return False
+        return getattr(user2, 'id', user2) in self.friend_id_set(user1)
 
 # Definition of the FriendshipRequest model
 class FriendshipRequest(models.Model):
@@ -216,18 +505,22 @@ class FriendshipRequest(models.Model):
     def accept(self):
         """ Accept this friendship request """
 
-        # Create Friend instances for both users and trigger the 'friendship_request_accepted' signal
-        Friend.objects.create(from_user=self.from_user, to_user=self.to_user)
-        Friend.objects.create(from_user=self.to_user, to_user=self.from_user)
-        friendship_request_accepted.send(
-            sender=self, from_user=self.from_user, to_user=self.to_user
-        )
-
-        # Delete the current friendship request and its reverse request (if any)
-        self.delete()
-        FriendshipRequest.objects.filter(
-            from_user=self.to_user, to_user=self.from_user
-        ).delete()
+        with transaction.atomic():
+            # Create Friend instances for both users and trigger the 'friendship_request_accepted' signal
+            Friend.objects.create_friendships([(self.from_user_id, self.to_user_id)])
+            adjust(User.objects.filter(id__in=[self.from_user_id, self.to_user_id]), friend_count=1)
+            friendship_request_accepted.send(
+                sender=self, from_user=self.from_user, to_user=self.to_user
+            )
+
+            # Delete the current friendship request and its reverse request (if any)
+            reverse = FriendshipRequest.objects.filter(from_user=self.to_user, to_user=self.from_user)
+            if self.viewed is None:
+                adjust(User.objects.filter(id=self.to_user_id), pending_request_count=-1)
+            adjust(User.objects.filter(id=self.from_user_id),
+                   pending_request_count=-reverse.filter(viewed__isnull=True).count())
+            self.delete()
+            reverse.delete()
 
         return True
 
@@ -241,15 +534,23 @@ class FriendshipRequest(models.Model):
     # Method to cancel a friendship request
     def cancel(self):
         """ cancel this friendship request """
-        self.delete()
-        friendship_request_canceled.send(sender=self)
+        with transaction.atomic():
+            # Sent while the request still has its primary key, a deleted instance cannot be a signal sender
+            friendship_request_canceled.send(sender=self)
+            self.delete()
+            if self.viewed is None:
+                adjust(User.objects.filter(id=self.to_user_id), pending_request_count=-1)
         return True
 
     # Method to mark a friendship request as viewed
     def mark_viewed(self):
+        was_unread = self.viewed is None
         self.viewed = timezone.now()
         friendship_request_viewed.send(sender=self)
-        self.save()
+        with transaction.atomic():
+            self.save()
+            if was_unread:
+                adjust(User.objects.filter(id=self.to_user_id), pending_request_count=-1)
         return True
 
 # Definition of the Friend model representing user friendships
@@ -273,6 +574,110 @@ class Friend(models.Model):
             raise ValidationError("Users cannot be friends with themselves.")
         super().save(*args, **kwargs)
 
+# Manager for the one row per pair friendship storage
+class SymmetricFriendshipManager(models.Manager):
+
+    # Method to retrieve the row of two users, whatever their order
+    def between(self, user1, user2):
+        user_low_id, user_high_id = sorted((getattr(user1, 'id', user1), getattr(user2, 'id', user2)))
+        return self.filter(user_low_id=user_low_id, user_high_id=user_high_id)
+
+    # Method to retrieve the friend ids of a user from both sides of the pairs, in one query
+    def friend_ids(self, user_id):
+        return list(
+            self.filter(user_low_id=user_id).values_list('user_high_id', flat=True).union(
+                self.filter(user_high_id=user_id).values_list('user_low_id', flat=True), all=True
+            )
+        )
+
+# Definition of the Friendship model, one row per unordered pair of friends with the lower user id first
+class Friendship(models.Model):
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = SymmetricFriendshipManager()
+
+    class Meta:
+        verbose_name = _("Friendship")
+        verbose_name_plural = _("Friendships")
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='friends_friendship_pair_uniq'),
+            models.CheckConstraint(check=Q(user_low__lt=F('user_high')), name='friends_friendship_ordered'),
+        ]
+        indexes = [
+            models.Index(fields=['user_high', 'user_low'], name='friends_friendship_high_idx'),
+        ]
+
+    # Build the row of two users in canonical order
+    @classmethod
+    def for_pair(cls, user1_id, user2_id):
+        if user1_id == user2_id:
+            raise ValidationError("Users cannot be friends with themselves.")
+        user_low_id, user_high_id = sorted((user1_id, user2_id))
+        return cls(user_low_id=user_low_id, user_high_id=user_high_id)
+
+# Manager for the precomputed friend recommendations
+class RecommendationManager(models.Manager):
+
+    # Method to retrieve the ranked recommendations of a user that are still relevant
+    def for_user(self, user):
+        pending = FriendshipRequest.objects.filter(Q(from_user=user) | Q(to_user=user))
+        return (
+            self.filter(user=user)
+                .exclude(candidate_id__in=Friend.objects.friend_ids(user))
+                .exclude(candidate_id__in=pending.values('to_user_id'))
+                .exclude(candidate_id__in=pending.values('from_user_id'))
+                .order_by('rank')
+        )
+
+# Definition of the FriendRecommendation model, written by the compute_recommendations command
+class FriendRecommendation(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friend_recommendations')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveIntegerField()  # Number of mutual friends
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    objects = RecommendationManager()
+
+    class Meta:
+        verbose_name = _("Friend Recommendation")
+        verbose_name_plural = _("Friend Recommendations")
+        unique_together = ("user", "candidate")
+        indexes = [
+            models.Index(fields=['user', 'rank'], name='friends_recommendation_idx'),
+        ]
+
+# Digest of the friend list of a user at the last recommendation run, used for incremental runs
+class RecommendationState(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    edges_digest = models.CharField(max_length=16)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+# Manager for the friend graph reports
+class GraphReportManager(models.Manager):
+
+    # Method to retrieve the summary of the latest report, cached for GRAPH_REPORT_CACHE_TIMEOUT seconds
+    def latest_summary(self):
+        def load():
+            report = self.order_by('-created_at').first()
+            # Cache the absence too, so pages without a report do not query on every request
+            return report.summary if report else {}
+        return cache.get_or_set(GRAPH_REPORT_CACHE_KEY, load, settings.GRAPH_REPORT_CACHE_TIMEOUT) or None
+
+# Summary of the friend graph written by the graph_report command
+class GraphReport(models.Model):
+    summary = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = GraphReportManager()
+
+    class Meta:
+        verbose_name = _("Graph Report")
+        verbose_name_plural = _("Graph Reports")
+        get_latest_by = "created_at"
+
 # Definition of the CustomNotification model
 class CustomNotification(models.Model):
     # Fields for a custom notification
@@ -283,7 +688,73 @@ class CustomNotification(models.Model):
         related_name='notifications',
         on_delete=models.CASCADE
     )
-    # Other fields representing notification details
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    url = models.TextField(blank=True, null=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # Grouped notifications: number of distinct actors (see NotificationActor) and the most recent ones, newest first
+    actor_count = models.PositiveIntegerField(default=1)
+    latest_actors = models.JSONField(default=list, blank=True)
+    deleted = models.BooleanField(db_index=True, default=False)
+    emailed = models.BooleanField(db_index=True, default=False)
+
+    # Optional object the notification is about (a post, a comment, a friend request...)
+    content_type = models.ForeignKey(ContentType, blank=True, null=True, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField(blank=True, null=True)
+    target = GenericForeignKey('content_type', 'object_id')
 
     objects = NotificationManager()  # Assigning the NotificationManager to manage CustomNotification instances
 
+    class Meta:
+        verbose_name = _("Notification")
+        verbose_name_plural = _("Notifications")
+        indexes = [
+            # Serves the unread count, the unread list and the inbox pages of a recipient
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='friends_notification_inbox_idx'),
+        ]
+
+# Definition of the NotificationActor model, one row per distinct actor of a grouped notification
+class NotificationActor(models.Model):
+    notification = models.ForeignKey(CustomNotification, on_delete=models.CASCADE, related_name='actors')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ("notification", "actor")
+
+# Drop the cached adjacency sets and suggestions of both users whenever their friendship changes
+@receiver(friendship_request_accepted)
+def invalidate_friend_graph_on_accept(sender, from_user, to_user, **kwargs):
+    friend_graph.invalidate_on_commit(from_user.id, to_user.id)
+    transaction.on_commit(lambda: invalidate_suggestions(from_user.id, to_user.id))
+
+
+@receiver(friendship_removed)
+def invalidate_friend_graph_on_remove(sender, from_user, to_user, **kwargs):
+    friend_graph.invalidate_on_commit(from_user.id, to_user.id)
+    transaction.on_commit(lambda: invalidate_suggestions(from_user.id, to_user.id))
+
+
+# A pending request takes both users out of each other's suggestions
+@receiver(friendship_request_created)
+def invalidate_suggestions_on_request(sender, **kwargs):
+    invalidate_suggestions(sender.from_user_id, sender.to_user_id)
+
+
+@receiver(friendship_request_canceled)
+def invalidate_suggestions_on_cancel(sender, **kwargs):
+    invalidate_suggestions(sender.from_user_id, sender.to_user_id)
+
+
+# A deleted account cascades away its friendships and requests, take them off the counters of the other users
+@receiver(pre_delete, sender=User)
+def uncount_deleted_user(sender, instance, **kwargs):
+    friend_ids = Friend.objects.stored_friend_ids(instance)
+    adjust(User.objects.filter(id__in=friend_ids), friend_count=-1)
+    # Requests are unique per sender and receiver, every receiver loses at most one
+    adjust(User.objects.filter(friendship_requests_received__from_user=instance,
+                               friendship_requests_received__viewed__isnull=True), pending_request_count=-1)
+    friend_graph.invalidate_on_commit(instance.id, *friend_ids)
+    transaction.on_commit(lambda: invalidate_suggestions(instance.id, *friend_ids))
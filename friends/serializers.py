@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from accounts.models import User
+from core.pagination import encode_cursor
 from core.serializers import DynamicFieldsModelSerializer
 from .models import CustomNotification, FriendshipRequest
 
@@ -13,6 +14,11 @@ class UserSerializer(DynamicFieldsModelSerializer):
 
 class NotificationSerializer(serializers.ModelSerializer):
     actor = UserSerializer(read_only=True)
+    # Position of the notification, clients mark read up to the newest one they display
+    cursor = serializers.SerializerMethodField()
+
+    def get_cursor(self, obj):
+        return encode_cursor(obj.created_at, obj.id)
 
     class Meta:
         model = CustomNotification
@@ -21,6 +27,10 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 class FriendshipRequestSerializer(DynamicFieldsModelSerializer):
     from_user = UserSerializer(excludes=['groups', 'user_permissions'])
+    cursor = serializers.SerializerMethodField()
+
+    def get_cursor(self, obj):
+        return encode_cursor(obj.created_at, obj.id)
 
     class Meta:
         model = FriendshipRequest
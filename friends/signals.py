@@ -4,6 +4,7 @@ friendship_request_created = Signal()
 friendship_request_rejected = Signal()
 friendship_request_canceled = Signal()
 friendship_request_viewed = Signal()
+friendship_requests_viewed = Signal()
 friendship_request_accepted = Signal()
 friendship_removed = Signal()
 follower_created = Signal()
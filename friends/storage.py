@@ -0,0 +1,72 @@
+"""
+    Copy friendships between the two storage layouts. The functions take the
+    model classes as arguments so migrations can pass their historical models.
+"""
+
+
+def collapse(Friend, Friendship, batch_size=1000):
+    """
+        Write one Friendship row, lower user id first, for every pair of
+        directed Friend rows. Works through Friend in primary key batches and
+        can be re-run: pairs already stored are skipped.
+    """
+    copied = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Friend.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'from_user_id', 'to_user_id', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return copied
+        last_id = rows[-1][0]
+
+        # Both directions of a pair usually land in the same batch, keep the first one
+        pairs = {}
+        for _, from_user_id, to_user_id, created_at in rows:
+            pairs.setdefault(tuple(sorted((from_user_id, to_user_id))), created_at)
+        Friendship.objects.bulk_create(
+            [Friendship(user_low_id=low_id, user_high_id=high_id, created_at=created_at)
+             for (low_id, high_id), created_at in pairs.items()],
+            ignore_conflicts=True,
+        )
+        copied += len(pairs)
+
+
+def expand(Friend, Friendship, batch_size=1000):
+    """
+        Write the two directed Friend rows of every Friendship row, in primary
+        key batches. Can be re-run: rows already stored are skipped.
+    """
+    copied = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Friendship.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'user_low_id', 'user_high_id', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return copied
+        last_id = rows[-1][0]
+
+        Friend.objects.bulk_create(
+            [Friend(from_user_id=low_id, to_user_id=high_id, created_at=created_at)
+             for _, low_id, high_id, created_at in rows] +
+            [Friend(from_user_id=high_id, to_user_id=low_id, created_at=created_at)
+             for _, low_id, high_id, created_at in rows],
+            ignore_conflicts=True,
+        )
+        copied += len(rows)
+
+
+def prune(model, batch_size=1000):
+    """
+        Delete every row of `model` in primary key batches, so no single
+        statement holds the write lock for long.
+    """
+    deleted = 0
+    while True:
+        ids = list(model.objects.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.models import User
+from friends.cache import suggestions_key
+from friends.models import Friend, FriendRecommendation, FriendshipRequest
+
+
+def _excluded_ids(user):
+    """
+        Ids that must never be suggested: the user, their friends and anyone a
+        request is pending with, in either direction.
+    """
+    excluded = set(Friend.objects.friend_id_set(user))
+    excluded.add(user.id)
+    excluded.update(FriendshipRequest.objects.filter(from_user=user).values_list('to_user_id', flat=True))
+    excluded.update(FriendshipRequest.objects.filter(to_user=user).values_list('from_user_id', flat=True))
+    return excluded
+
+
+def _rank(user, limit):
+    # Recommendations precomputed by the compute_recommendations command, in one indexed query
+    ranked = list(FriendRecommendation.objects.for_user(user).values_list('candidate_id', 'score')[:limit])
+
+    friend_ids = Friend.objects.friend_ids(user)
+    excluded = _excluded_ids(user)
+
+    # Otherwise friends of friends, ranked by how many of the user's friends they are friends with
+    if not ranked and friend_ids:
+        ranked = Friend.objects.mutual_friend_counts(friend_ids, excluded, limit)
+
+    # Fill up with the most connected users, which is all a user without friends gets
+    if len(ranked) < limit:
+        excluded.update(user_id for user_id, mutual in ranked)
+        fallback = (
+            User.objects.filter(is_active=True)
+            .exclude(id__in=excluded)
+            .order_by('-friend_count', '-id')
+            .values_list('id', flat=True)[:limit - len(ranked)]
+        )
+        ranked.extend((user_id, 0) for user_id in fallback)
+    return ranked
+
+
+def suggestions(user):
+    """
+        Ranked [(user_id, mutual_friend_count), ...] of friend suggestions for
+        `user`, cached for FRIEND_SUGGESTIONS_TIMEOUT seconds.
+    """
+    key = suggestions_key(user.id)
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = _rank(user, settings.FRIEND_SUGGESTIONS_LIMIT)
+        cache.set(key, ranked, settings.FRIEND_SUGGESTIONS_TIMEOUT)
+    return ranked
+
+
+def load_users(ranked):
+    """
+        Load the users of a slice of `suggestions()` in ranking order, with the
+        mutual friend count set as `mutual_friends`.
+    """
+    users = User.objects.select_related('profile').in_bulk([user_id for user_id, mutual in ranked])
+    result = []
+    for user_id, mutual in ranked:
+        if user_id in users:
+            users[user_id].mutual_friends = mutual
+            result.append(users[user_id])
+    return result
@@ -1,3 +1,300 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.counters import adjust
+from friends.cache import friend_graph
+from core.contants.common import COMMENT_VERB
+from core.pagination import encode_cursor
+from friends.models import CustomNotification, Friend, FriendshipRequest
+from newsfeed.models import Post
+
+
+class FriendGraphTestCase(TestCase):
+    """ Rolled back friendships must not survive in the process wide caches """
+
+    def setUp(self):
+        friend_graph.clear()
+        cache.clear()
+        self.addCleanup(friend_graph.clear)
+
+
+def create_users(*usernames):
+    return [User.objects.create_user(username=username, email='{}@example.com'.format(username),
+                                     password='x', gender='male')
+            for username in usernames]
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS={'comment': None, 'like': 500},
+                   NOTIFICATION_DEFAULT_RETENTION_DAYS=90, NOTIFICATION_UNREAD_RETENTION_DAYS=365)
+class NotificationRetentionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipient = User.objects.create_user(username='recipient', email='recipient@example.com',
+                                                 password='x', gender='male')
+        cls.actor = User.objects.create_user(username='actor', email='actor@example.com',
+                                             password='x', gender='male')
+
+    def notify(self, verb, days, **fields):
+        return CustomNotification.objects.create(recipient=self.recipient, actor=self.actor, verb=verb,
+                                                 created_at=timezone.now() - timedelta(days=days), **fields)
+
+    def test_unread_notification_expires_after_unread_retention(self):
+        unread = self.notify('comment', 400)
+        recent = self.notify('comment', 300)
+        expired = CustomNotification.objects.expired()
+        self.assertIn(unread, expired)
+        self.assertNotIn(recent, expired)
+
+    def test_read_notification_outlives_unread_retention(self):
+        kept_forever = self.notify('comment', 400, is_read=True)
+        longer_policy = self.notify('like', 400, is_read=True)
+        dismissed = self.notify('comment', 400, deleted=True)
+        self.assertFalse(CustomNotification.objects.expired().filter(
+            id__in=[kept_forever.id, longer_policy.id, dismissed.id]).exists())
+
+    def test_read_notification_expires_by_verb_policy(self):
+        expired_like = self.notify('like', 600, is_read=True)
+        expired_default = self.notify('friend_request', 100, is_read=True)
+        recent_default = self.notify('friend_request', 30, is_read=True)
+        expired = CustomNotification.objects.expired()
+        self.assertIn(expired_like, expired)
+        self.assertIn(expired_default, expired)
+        self.assertNotIn(recent_default, expired)
+
+
+class FriendCounterTests(FriendGraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = create_users('alice', 'bob', 'carol')
+
+    def counters(self, user):
+        return User.objects.filter(id=user.id).values_list('friend_count', 'pending_request_count').get()
+
+    def test_request_and_accept_move_counters(self):
+        request = Friend.objects.add_friend(self.alice, self.bob)
+        self.assertEqual(self.counters(self.bob), (0, 1))
+        request.accept()
+        self.assertEqual(self.counters(self.alice), (1, 0))
+        self.assertEqual(self.counters(self.bob), (1, 0))
+
+    def test_cancel_and_view_lower_pending_count(self):
+        Friend.objects.add_friend(self.alice, self.bob).cancel()
+        self.assertEqual(self.counters(self.bob), (0, 0))
+        Friend.objects.add_friend(self.carol, self.bob).mark_viewed()
+        self.assertEqual(self.counters(self.bob), (0, 0))
+
+    def test_remove_friend_decrements_both(self):
+        Friend.objects.add_friend(self.alice, self.bob).accept()
+        Friend.objects.remove_friend(self.alice, self.bob)
+        self.assertEqual(self.counters(self.alice), (0, 0))
+        self.assertEqual(self.counters(self.bob), (0, 0))
+
+    def test_deleted_user_leaves_counters_of_others(self):
+        Friend.objects.add_friend(self.alice, self.bob).accept()
+        Friend.objects.add_friend(self.alice, self.carol)
+        # Profile.user does not cascade, the profile goes first
+        self.alice.profile.delete()
+        self.alice.delete()
+        self.assertEqual(self.counters(self.bob), (0, 0))
+        self.assertEqual(self.counters(self.carol), (0, 0))
+
+    def test_counters_floor_at_zero(self):
+        adjust(User.objects.filter(id=self.alice.id), friend_count=-3, pending_request_count=-1)
+        self.assertEqual(self.counters(self.alice), (0, 0))
+
+    def test_reconcile_counters_repairs_drift(self):
+        Friend.objects.add_friend(self.alice, self.bob).accept()
+        Friend.objects.add_friend(self.carol, self.bob)
+        User.objects.filter(id=self.bob.id).update(friend_count=5, pending_request_count=0)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.bob), (1, 1))
+
+
+# Websocket events are captured instead of going through the channel layer
+@mock.patch('friends.views.deliver')
+class FriendBatchViewTests(FriendGraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol, self.dave = create_users('alice', 'bob', 'carol', 'dave')
+        self.client.force_login(self.alice)
+
+    def post_usernames(self, name, usernames):
+        return self.client.post(reverse(name), json.dumps({'usernames': usernames}),
+                                content_type='application/json')
+
+    def test_relationships(self, deliver):
+        Friend.objects.add_friend(self.alice, self.bob).accept()
+        Friend.objects.add_friend(self.alice, self.carol)
+        Friend.objects.add_friend(self.dave, self.alice)
+        ids = [self.bob.id, self.carol.id, self.dave.id, self.alice.id]
+        response = self.client.get(reverse('friends:relationships'), {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['relationships'], {
+            str(self.bob.id): 'friend',
+            str(self.carol.id): 'request_sent',
+            str(self.dave.id): 'request_received',
+        })
+
+    def test_relationships_rejects_bad_input(self, deliver):
+        self.assertEqual(self.client.get(reverse('friends:relationships'), {'ids': '1,x'}).status_code, 400)
+        with self.settings(RELATIONSHIP_STATUS_MAX_IDS=2):
+            self.assertEqual(self.client.get(reverse('friends:relationships'), {'ids': '1,2,3'}).status_code, 400)
+
+    def test_send_requests_skips_existing_relationships(self, deliver):
+        Friend.objects.add_friend(self.alice, self.bob).accept()
+        Friend.objects.add_friend(self.alice, self.carol)
+        response = self.post_usernames('friends:send-requests', ['bob', 'carol', 'dave', 'dave', 'nobody'])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['sent'], ['dave'])
+        self.assertEqual(data['skipped'], {'bob': 'friend', 'carol': 'request_sent', 'nobody': 'not_found'})
+        self.assertTrue(FriendshipRequest.objects.filter(from_user=self.alice, to_user=self.dave).exists())
+        self.assertEqual(FriendshipRequest.objects.filter(from_user=self.alice, to_user=self.carol).count(), 1)
+        # One event per new request, to its receiver
+        self.assertEqual([call.args[0] for call in deliver.call_args_list], ['all_friend_requests_dave'])
+
+    def test_send_requests_validates_the_batch(self, deliver):
+        self.assertEqual(self.client.get(reverse('friends:send-requests')).status_code, 405)
+        self.assertEqual(self.post_usernames('friends:send-requests', []).status_code, 400)
+        with self.settings(FRIEND_BATCH_MAX_USERS=2):
+            self.assertEqual(self.post_usernames('friends:send-requests', ['bob', 'carol', 'dave']).status_code, 400)
+        deliver.assert_not_called()
+
+    def test_accept_requests_accepts_only_pending_requests(self, deliver):
+        Friend.objects.add_friend(self.bob, self.alice)
+        Friend.objects.add_friend(self.carol, self.alice).reject()
+        response = self.post_usernames('friends:accept-requests', ['bob', 'carol', 'dave'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], ['bob'])
+        self.assertTrue(Friend.objects.are_friends(self.alice, self.bob))
+        self.assertFalse(Friend.objects.are_friends(self.alice, self.carol))
+        self.assertEqual(deliver.call_count, 1)
+
+        # Accepting again finds nothing pending and sends nothing
+        response = self.post_usernames('friends:accept-requests', ['bob'])
+        self.assertEqual(response.json()['accepted'], [])
+        self.assertEqual(deliver.call_count, 1)
+
+
+class NotificationGroupingTests(FriendGraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipient, *self.actors = create_users('recipient', 'one', 'two', 'three', 'four')
+        self.post = Post.objects.create(user=self.recipient, body="hello")
+
+    def notify(self, actor):
+        return CustomNotification.objects.notify(self.recipient, actor, COMMENT_VERB, self.post, "commented")
+
+    @override_settings(NOTIFICATION_LATEST_ACTORS=3)
+    def test_repeat_actor_outside_latest_actors_is_not_counted_again(self):
+        for actor in self.actors:
+            self.notify(actor)
+        # The first actor is no longer among the three latest ones
+        notification, created = self.notify(self.actors[0])
+        self.assertFalse(created)
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual(notification.description, "and 3 others commented")
+        self.assertEqual([entry['id'] for entry in notification.latest_actors],
+                         [self.actors[0].id, self.actors[3].id, self.actors[2].id])
+
+    def test_same_actor_folds_into_one_row(self):
+        first, created = self.notify(self.actors[0])
+        self.assertTrue(created)
+        again, created = self.notify(self.actors[0])
+        self.assertFalse(created)
+        self.assertEqual(again.id, first.id)
+        self.assertEqual(again.actor_count, 1)
+        self.assertEqual(again.description, "commented")
+        self.assertEqual(CustomNotification.objects.filter(recipient=self.recipient).count(), 1)
+
+    def test_new_actor_is_counted(self):
+        self.notify(self.actors[0])
+        notification, created = self.notify(self.actors[1])
+        self.assertFalse(created)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.description, "and 1 other commented")
+        self.assertEqual(notification.actor, self.actors[1])
+
+    def test_read_or_old_notifications_are_not_grouped(self):
+        first, _ = self.notify(self.actors[0])
+        CustomNotification.objects.filter(id=first.id).update(is_read=True)
+        second, created = self.notify(self.actors[1])
+        self.assertTrue(created)
+        CustomNotification.objects.filter(id=second.id).update(created_at=timezone.now() - timedelta(days=1))
+        _, created = self.notify(self.actors[2])
+        self.assertTrue(created)
+
+
+# Websocket events are captured instead of going through the channel layer. The transactions commit for
+# real, so the cached unread counter moves before the view reads it back, like in production
+@mock.patch('notifications.views.deliver')
+class MarkNotificationsReadTests(TransactionTestCase):
+
+    def setUp(self):
+        friend_graph.clear()
+        cache.clear()
+        self.recipient, self.actor = create_users('recipient', 'actor')
+        self.client.force_login(self.recipient)
+        # One post per notification so they are not grouped, oldest first
+        now = timezone.now()
+        self.notifications = []
+        for minutes in (30, 20, 10):
+            post = Post.objects.create(user=self.recipient, body="post")
+            notification, _ = CustomNotification.objects.notify(self.recipient, self.actor, COMMENT_VERB,
+                                                                post, "commented")
+            CustomNotification.objects.filter(id=notification.id).update(created_at=now - timedelta(minutes=minutes))
+            notification.refresh_from_db()
+            self.notifications.append(notification)
+
+    def unread_count(self):
+        return CustomNotification.objects.user_unread_notification_count(self.recipient)
+
+    def mark_read(self, data):
+        return self.client.post(reverse('notifications:mark-like-comment-notifications-as-read'), data)
+
+    def test_cursor_bounds_the_notifications_marked_read(self, deliver):
+        self.assertEqual(self.unread_count(), 3)
+        middle = self.notifications[1]
+        response = self.mark_read({'cursor': encode_cursor(middle.created_at, middle.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_notifications'], 1)
+        self.assertEqual(self.unread_count(), 1)
+        # Only the notification newer than the cursor is left unread
+        self.assertEqual(list(CustomNotification.objects.filter(is_read=False)), [self.notifications[2]])
+        event = deliver.call_args.args[1]
+        self.assertEqual(event['read_up_to']['id'], middle.id)
+        self.assertEqual(event['unread_notifications'], 1)
+
+    def test_without_cursor_everything_is_marked_read(self, deliver):
+        self.unread_count()
+        response = self.mark_read({})
+        self.assertEqual(response.json()['unread_notifications'], 0)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertIsNone(deliver.call_args.args[1]['read_up_to'])
+
+    def test_nothing_to_mark_sends_no_event(self, deliver):
+        self.mark_read({})
+        deliver.reset_mock()
+        response = self.mark_read({})
+        self.assertEqual(response.json()['unread_notifications'], 0)
+        deliver.assert_not_called()
+
+    def test_invalid_requests(self, deliver):
+        self.assertEqual(self.mark_read({'cursor': 'bad'}).status_code, 400)
+        url = reverse('notifications:mark-like-comment-notifications-as-read')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.unread_count(), 3)
+        deliver.assert_not_called()
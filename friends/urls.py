@@ -9,4 +9,8 @@ urlpatterns = [
     path('send-request/<slug:username>', send_request, name="send-request"),
     path('accept-request/<slug:friend>', accept_request, name="accept-request"),
     path('cancel-request/<slug:friend>', cancel_request, name="cancel-request"),
+    path('relationships', relationships, name="relationships"),
+    path('send-requests', send_requests, name="send-requests"),
+    path('accept-requests', accept_requests, name="accept-requests"),
+    path('mark-requests-viewed', mark_requests_viewed, name="mark-requests-viewed"),
 ]
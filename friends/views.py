@@ -1,17 +1,22 @@
 # Import necessary modules/classes
+import json
+
 from rest_framework.decorators import api_view
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.decorators import login_required
+from django.urls import reverse_lazy
 from accounts.models import User
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.views.generic import ListView
-from django.db.models import Q
+from django.conf import settings
 
 # Import constants and serializers from the project
-from core.contants.common import FRIEND_REQUEST_VERB
-from .serializers import NotificationSerializer, FriendshipRequestSerializer
-from .models import FriendshipRequest, Friend, CustomNotification
+from core.delivery import deliver
+from core.pagination import encode_cursor, InvalidCursor
+from .serializers import FriendshipRequestSerializer
+from .models import FriendshipRequest, Friend
+from . import suggestions
 
 # Define a class-based view inheriting LoginRequiredMixin and ListView for finding friends
 class FindFriendsListView(LoginRequiredMixin, ListView):
@@ -19,16 +24,21 @@ class FindFriendsListView(LoginRequiredMixin, ListView):
     context_object_name = 'users'
     template_name = "friends/find-friends.html"
 
-    # Retrieve users who are not friends and have not received/sent a friend request
+    paginate_by = settings.FRIEND_SUGGESTIONS_PAGE_SIZE
+
+    # Retrieve the ranked (user id, mutual friend count) suggestions of the current user
     def get_queryset(self):
-        current_user_friends = self.request.user.friends.values('id')
-        sent_request = list(
-            FriendshipRequest.objects.filter(Q(from_user=self.request.user))
-            .exclude(to_user_id=self.request.user.id)
-            .values_list('to_user_id', flat=True))
-        users = User.objects.exclude(id__in=current_user_friends).exclude(id__in=sent_request).exclude(
-            id=self.request.user.id)
-        return users
+        return suggestions.suggestions(self.request.user)
+
+    # Load only the users shown on the current page, with their relationship to the current user
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        users = suggestions.load_users(context['object_list'])
+        statuses = Friend.objects.relationship_statuses(self.request.user, [user.id for user in users])
+        for user in users:
+            user.relationship = statuses[user.id]
+        context['users'] = users
+        return context
 
 # Define a class-based view inheriting LoginRequiredMixin and ListView for friend requests
 class FriendRequestsListView(LoginRequiredMixin, ListView):
@@ -43,13 +53,78 @@ class FriendRequestsListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Friend.objects.got_friend_requests(user=self.request.user)
 
-# Define a function to send a friend request
-def send_request(request, username=None):
+    # Attach the relationship of every sender to the current user
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        friend_requests = context['friend_requests']
+        statuses = Friend.objects.relationship_statuses(
+            self.request.user, [friend_request.from_user_id for friend_request in friend_requests]
+        )
+        for friend_request in friend_requests:
+            friend_request.from_user.relationship = statuses[friend_request.from_user_id]
+
+        # The requests on the page are seen now, requests received meanwhile stay unviewed
+        if friend_requests:
+            newest = max(friend_requests, key=lambda friend_request: (friend_request.created_at, friend_request.id))
+            Friend.objects.mark_requests_viewed(self.request.user, cursor=encode_cursor(newest.created_at, newest.id))
+        return context
+
+# Mark the friend requests the current user received as viewed, up to the `cursor` of the newest one displayed
+def mark_requests_viewed(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({'status': False, 'message': "POST required"}, status=405)
+
+    try:
+        updated = Friend.objects.mark_requests_viewed(request.user, cursor=request.POST.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
+    return JsonResponse({
+        'status': True,
+        'message': "Marked {} friend request(s) as viewed".format(updated),
+    })
+
+# Return the relationship of the current user to each of the requested user ids
+@login_required(login_url=reverse_lazy("accounts:login"))
+def relationships(request):
+    try:
+        user_ids = [int(user_id) for user_id in request.GET.get('ids', '').split(',') if user_id]
+    except ValueError:
+        return JsonResponse({'status': False, 'message': "Invalid user ids"}, status=400)
+
+    if len(user_ids) > settings.RELATIONSHIP_STATUS_MAX_IDS:
+        return JsonResponse({
+            'status': False,
+            'message': "At most {} user ids can be requested".format(settings.RELATIONSHIP_STATUS_MAX_IDS),
+        }, status=400)
+
+    statuses = Friend.objects.relationship_statuses(request.user, user_ids)
+    return JsonResponse({
+        'status': True,
+        'relationships': {str(user_id): status for user_id, status in statuses.items()},
+    })
+
+# Create a friend request from the current user, returning it with its serialized form
+@sync_to_async
+def create_friend_request(request, username):
+    friend_user = User.objects.get(username=username)
+    friend_request = Friend.objects.add_friend(request.user, friend_user, message='Hi! I would like to add you')
+    return friend_user, FriendshipRequestSerializer(friend_request).data
+
+# Accept the friend request the current user got from the given username
+@sync_to_async
+def accept_friend_request(request, username):
+    friend_user = User.objects.get(username=username)
+    friend_request = FriendshipRequest.objects.get(to_user=request.user, from_user=friend_user)
+    friend_request.accept()
+
+# Define an asynchronous function to send a friend request
+async def send_request(request, username=None):
     # Check if the username exists, if yes, send a friend request
     if username is not None:
-        friend_user = User.objects.get(username=username)
         try:
-            friend_request = Friend.objects.add_friend(request.user, friend_user, message='Hi! I would like to add you')
+            friend_user, notification = await create_friend_request(request, username)
         except Exception as e:
             # If an error occurs during the request, return an error response
             data = {
@@ -57,14 +132,13 @@ def send_request(request, username=None):
                 'message': str(e),
             }
             return JsonResponse(data)
-        # Use Channels to notify the friend about the new friend request
-        channel_layer = get_channel_layer()
+        # Queue the notification, it goes out batched with the friend's other pending events
         channel = "all_friend_requests_{}".format(friend_user.username)
-        async_to_sync(channel_layer.group_send)(
+        deliver(
             channel, {
                 "type": "notify",  # method name
                 "command": "new_friend_request",
-                "notification": FriendshipRequestSerializer(friend_request).data
+                "notification": notification
             }
         )
         # Return a success response after sending the request
@@ -76,13 +150,11 @@ def send_request(request, username=None):
     else:
         pass
 
-# Define a function to accept a friend request
-def accept_request(request, friend=None):
+# Define an asynchronous function to accept a friend request
+async def accept_request(request, friend=None):
     # Check if the friend username exists, if yes, accept the friend request
     if friend is not None:
-        friend_user = User.objects.get(username=friend)
-        friend_request = FriendshipRequest.objects.get(to_user=request.user, from_user=friend_user)
-        friend_request.accept()
+        await accept_friend_request(request, friend)
         # Return a success response after accepting the request
         data = {
             'status': True,
@@ -90,6 +162,110 @@ def accept_request(request, friend=None):
         }
         return JsonResponse(data)
 
+# Read the usernames of a batch request, from a JSON body or repeated form fields
+def batch_usernames(request):
+    if request.content_type == 'application/json':
+        try:
+            usernames = json.loads(request.body or b'{}').get('usernames', [])
+        except (ValueError, AttributeError):
+            usernames = []
+    else:
+        usernames = request.POST.getlist('usernames')
+    return list(dict.fromkeys(username for username in usernames if isinstance(username, str)))
+
+# Create the friend requests of a batch, returning the serialized requests per receiver
+@sync_to_async
+def create_friend_requests(request, usernames):
+    if not request.user.is_authenticated:
+        return None
+    friend_users = list(User.objects.filter(username__in=usernames))
+    friend_requests, skipped = Friend.objects.add_friends(
+        request.user, friend_users, message='Hi! I would like to add you'
+    )
+    notifications = {
+        friend_request.to_user.username: FriendshipRequestSerializer(friend_request).data
+        for friend_request in friend_requests
+    }
+    missing = set(usernames) - {friend_user.username for friend_user in friend_users}
+    skipped.update({username: 'not_found' for username in missing})
+    return notifications, skipped
+
+# Accept the friend requests of a batch, returning the usernames that were accepted
+@sync_to_async
+def accept_friend_requests(request, usernames):
+    if not request.user.is_authenticated:
+        return None
+    friend_users = User.objects.filter(username__in=usernames)
+    return [friend_user.username for friend_user in Friend.objects.accept_requests(request.user, friend_users)]
+
+# Send friend requests to many users at once, notifying each receiver with a single message
+async def send_requests(request):
+    if request.method != "POST":
+        return JsonResponse({'status': False, 'message': "POST required"}, status=405)
+
+    usernames = batch_usernames(request)
+    if not usernames or len(usernames) > settings.FRIEND_BATCH_MAX_USERS:
+        return JsonResponse({
+            'status': False,
+            'message': "Between 1 and {} usernames are required".format(settings.FRIEND_BATCH_MAX_USERS),
+        }, status=400)
+
+    result = await create_friend_requests(request, usernames)
+    if result is None:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+    notifications, skipped = result
+
+    # Queue one notification per receiver, the delivery layer batches them per group
+    for username, notification in notifications.items():
+        deliver(
+            "all_friend_requests_{}".format(username), {
+                "type": "notify",  # method name
+                "command": "new_friend_request",
+                "notification": notification
+            }
+        )
+
+    data = {
+        'status': True,
+        'message': "{} request(s) sent.".format(len(notifications)),
+        'sent': list(notifications),
+        'skipped': skipped,
+    }
+    return JsonResponse(data)
+
+# Accept the friend requests of many users at once
+async def accept_requests(request):
+    if request.method != "POST":
+        return JsonResponse({'status': False, 'message': "POST required"}, status=405)
+
+    usernames = batch_usernames(request)
+    if not usernames or len(usernames) > settings.FRIEND_BATCH_MAX_USERS:
+        return JsonResponse({
+            'status': False,
+            'message': "Between 1 and {} usernames are required".format(settings.FRIEND_BATCH_MAX_USERS),
+        }, status=400)
+
+    accepted = await accept_friend_requests(request, usernames)
+    if accepted is None:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+
+    # One message tells the receiver's open pages which requests are gone
+    if accepted:
+        deliver(
+            "all_friend_requests_{}".format(request.user.username), {
+                "type": "notify",  # method name
+                "command": "friend_requests_accepted",
+                "usernames": accepted
+            }
+        )
+
+    data = {
+        'status': True,
+        'message': "You accepted {} friend request(s)".format(len(accepted)),
+        'accepted': accepted,
+    }
+    return JsonResponse(data)
+
 # Define an API view to cancel a friend request
 @api_view(['DELETE'])
 def cancel_request(request, friend=None):
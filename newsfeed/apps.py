@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from .search import install
+    install(connections[using])
 
 
 class NewsfeedConfig(AppConfig):
     name = 'newsfeed'
+
+    def ready(self):
+        post_migrate.connect(install_search_index, sender=self)
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import caches
+
+HITS_KEY = "post-fragment:hits"
+MISSES_KEY = "post-fragment:misses"
+
+
+def fragment_cache():
+    return caches[settings.POST_FRAGMENT_CACHE]
+
+
+def fragment_key(post, is_owner):
+    """
+        Key of the rendered block of a post. The per-post version is part of the
+        key, so bumping it makes every stale copy unreachable at once.
+    """
+    return "post-fragment:{}:{}:{}".format(post.id, post.version, int(is_owner))
+
+
+def _count(key):
+    cache = fragment_cache()
+    # add() is a no-op if the counter already exists, incr() is atomic on shared backends
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_or_render(post, is_owner, render):
+    cache = fragment_cache()
+    key = fragment_key(post, is_owner)
+    content = cache.get(key)
+    if content is not None:
+        _count(HITS_KEY)
+        return content
+
+    _count(MISSES_KEY)
+    content = render()
+    cache.set(key, content, settings.POST_FRAGMENT_TIMEOUT)
+    return content
+
+
+def stats():
+    cache = fragment_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
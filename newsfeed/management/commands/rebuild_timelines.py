@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from newsfeed.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized home timelines of all users from posts and friendships"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='usernames', action='append', default=[],
+                            help="Only rebuild the timeline of this username (can be repeated)")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        total = 0
+        for user in users.iterator():
+            TimelineEntry.objects.rebuild(user)
+            total += 1
+            if options['verbosity'] > 1:
+                self.stdout.write("Rebuilt timeline of {}".format(user.username))
+
+        self.stdout.write(self.style.SUCCESS("Rebuilt {} timeline(s)".format(total)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from newsfeed import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of posts and comments in primary key chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Number of rows copied into the index per statement")
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search requires the SQLite FTS5 extension")
+
+        def progress(table, count):
+            if options['verbosity'] > 1:
+                self.stdout.write("{}: {} rows".format(table, count))
+
+        search.install()
+        counts = search.reindex(chunk_size=options['chunk_size'], progress=progress)
+        for table, count in counts.items():
+            self.stdout.write(self.style.SUCCESS("Indexed {} rows of {}".format(count, table)))
@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsfeed', '0004_auto_20190902_1119'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'id'], name='newsfeed_post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.0 on 2026-10-17 19:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+        Materialize the timeline of every existing user from their own and
+        their friends' posts, like TimelineManager.rebuild. Works per user
+        with posts read and inserted in chunks of BATCH_SIZE.
+    """
+    User = apps.get_model('accounts', 'User')
+    Friend = apps.get_model('friends', 'Friend')
+    Post = apps.get_model('newsfeed', 'Post')
+    TimelineEntry = apps.get_model('newsfeed', 'TimelineEntry')
+
+    def insert(owner_id, rows):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=owner_id, post_id=post_id, post_created_at=created_at)
+             for post_id, created_at in rows],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+
+    for owner_id in User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE):
+        author_ids = list(Friend.objects.filter(to_user_id=owner_id).values_list('from_user_id', flat=True))
+        author_ids.append(owner_id)
+        posts = Post.objects.filter(user_id__in=author_ids).values_list('id', 'created_at')
+        rows = []
+        for row in posts.iterator(chunk_size=BATCH_SIZE):
+            rows.append(row)
+            if len(rows) >= BATCH_SIZE:
+                insert(owner_id, rows)
+                rows = []
+        if rows:
+            insert(owner_id, rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_first_name'),
+        ('friends', '0007_alter_friend_options_rename_user_friend_from_user_and_more'),
+        ('newsfeed', '0005_post_feed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_created_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='accounts.user')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='newsfeed.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'post_created_at', 'post'], name='newsfeed_timeline_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('owner', 'post')},
+        ),
+        # Existing users would see an empty home feed until rebuild_timelines ran
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
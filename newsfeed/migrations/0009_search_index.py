@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from newsfeed.search import install, is_supported, reindex
+    install(schema_editor.connection)
+    # The triggers only cover rows written from now on, index the posts and comments already stored
+    if is_supported(schema_editor.connection):
+        reindex(conn=schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from newsfeed.search import uninstall
+    uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsfeed', '0008_post_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
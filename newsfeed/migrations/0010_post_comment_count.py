@@ -0,0 +1,29 @@
+# Generated by Django 4.0 on 2026-10-17 19:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def initialize_comment_count(apps, schema_editor):
+    Post = apps.get_model('newsfeed', 'Post')
+    Comment = apps.get_model('newsfeed', 'Comment')
+    counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        total=Count('id')).values('total')
+    Post.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsfeed', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(initialize_comment_count, migrations.RunPython.noop),
+    ]
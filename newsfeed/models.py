@@ -1,23 +1,196 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
 from django.contrib.humanize.templatetags import humanize
+from django.dispatch import receiver
 from accounts.models import User
+from userprofile.models import Profile
 from django.utils.timezone import now
 
+from core.counters import adjust
+from core.pagination import encode_cursor
+from friends.models import Friend
+from friends.signals import friendship_request_accepted, friendship_removed
+
+
+class PostManager(models.Manager):
+
+    # Queryset shared by every page of the news feed
+    def feed(self):
+        return self.select_related('user__profile')
+
+    # Invalidate the cached blocks of the matching posts
+    def bump_version(self, **filters):
+        return self.filter(**filters).update(version=F('version') + 1)
+
 
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     body = models.TextField()
     created_at = models.DateTimeField(default=now)
+    # Part of the cache key of the rendered post block, bumped whenever that block changes
+    version = models.PositiveIntegerField(default=1)
+    # Denormalized number of comments, maintained by CommentManager.add_comment and uncount_comment
+    comment_count = models.PositiveIntegerField(default=0)
+
+    objects = PostManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='newsfeed_post_feed_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='newsfeed_post_user_idx'),
+        ]
 
     def get_date(self):
         return humanize.naturaltime(self.created_at)
 
 
+class CommentManager(models.Manager):
+
+    # Queryset shared by every page of a post's comments
+    def feed(self, post):
+        return self.filter(post=post).select_related('user__profile')
+
+    # Save a comment, counting it and invalidating the cached block of its post in the same transaction
+    def add_comment(self, post, user, content):
+        with transaction.atomic():
+            comment = self.create(post=post, user=user, content=content)
+            adjust(Post.objects.filter(id=post.id), comment_count=1, version=1)
+        return comment
+
+    # Attach the latest comments and the cursor of older comments to each post of a page
+    def attach_previews(self, posts, limit=None):
+        if limit is None:
+            limit = settings.COMMENT_PREVIEW_SIZE
+        post_ids = [post.id for post in posts]
+        if not post_ids:
+            return posts
+
+        # One bounded index range per post, all fetched in a single query
+        latest = Q()
+        for post_id in post_ids:
+            latest |= Q(id__in=self.filter(post_id=post_id).order_by('-created_at', '-id').values('id')[:limit])
+        previews = defaultdict(list)
+        for comment in self.filter(latest).select_related('user__profile').order_by('created_at', 'id'):
+            previews[comment.post_id].append(comment)
+
+        for post in posts:
+            post.preview_comments = previews[post.id]
+            post.comments_cursor = None
+            # The counter may run ahead of the stored comments until reconcile_counters repairs it
+            if post.preview_comments and post.comment_count > len(post.preview_comments):
+                oldest = post.preview_comments[0]
+                post.comments_cursor = encode_cursor(oldest.created_at, oldest.id)
+        return posts
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(default=now)
 
+    objects = CommentManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='newsfeed_comment_post_idx'),
+        ]
+
     def get_date(self):
         return humanize.naturaltime(self.created_at)
+
+
+class TimelineManager(models.Manager):
+    """
+        Maintains the materialized per-user timelines. Rows written here stay,
+        so friend ids are read from the database, never from the friend graph cache.
+    """
+
+    batch_size = 1000
+
+    # Queryset shared by every page of a user's home timeline
+    def feed(self, user):
+        return self.filter(owner=user).select_related('post__user__profile')
+
+    # Insert timeline entries for the given owners from (post_id, created_at) rows
+    def _insert(self, owner_ids, rows):
+        entries = [
+            TimelineEntry(owner_id=owner_id, post_id=post_id, post_created_at=created_at)
+            for owner_id in owner_ids
+            for post_id, created_at in rows
+        ]
+        self.bulk_create(entries, batch_size=self.batch_size, ignore_conflicts=True)
+
+    # Insert every post of the given authors into the timelines of the given owners, in chunks
+    def _copy_posts(self, owner_ids, author_ids):
+        posts = Post.objects.filter(user_id__in=author_ids).values_list('id', 'created_at')
+        rows = []
+        for row in posts.iterator(chunk_size=self.batch_size):
+            rows.append(row)
+            if len(rows) >= self.batch_size:
+                self._insert(owner_ids, rows)
+                rows = []
+        if rows:
+            self._insert(owner_ids, rows)
+
+    # Push a new post into the timelines of its author and all of the author's friends
+    def fan_out(self, post):
+        owner_ids = Friend.objects.stored_friend_ids(post.user) + [post.user_id]
+        self._insert(owner_ids, [(post.id, post.created_at)])
+
+    # Copy the posts of a new friend into the owner's timeline
+    def backfill(self, owner, friend):
+        self._copy_posts([owner.id], [friend.id])
+
+    # Remove the posts of a former friend from the owner's timeline
+    def prune(self, owner, friend):
+        self.filter(owner=owner, post__user=friend).delete()
+
+    # Rebuild a user's timeline from their own and their friends' posts
+    def rebuild(self, user):
+        self.filter(owner=user).delete()
+        self._copy_posts([user.id], Friend.objects.stored_friend_ids(user) + [user.id])
+
+
+class TimelineEntry(models.Model):
+    """ A post materialized into the home timeline of one user """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    # Copy of post.created_at so that a timeline page is a range scan of one index
+    post_created_at = models.DateTimeField()
+
+    objects = TimelineManager()
+
+    class Meta:
+        unique_together = ("owner", "post")
+        indexes = [
+            models.Index(fields=['owner', 'post_created_at', 'post'], name='newsfeed_timeline_feed_idx'),
+        ]
+
+
+@receiver(friendship_request_accepted)
+def backfill_timelines(sender, from_user, to_user, **kwargs):
+    TimelineEntry.objects.backfill(from_user, to_user)
+    TimelineEntry.objects.backfill(to_user, from_user)
+
+
+@receiver(friendship_removed)
+def prune_timelines(sender, from_user, to_user, **kwargs):
+    TimelineEntry.objects.prune(from_user, to_user)
+    TimelineEntry.objects.prune(to_user, from_user)
+
+
+@receiver(post_save, sender=Profile)
+def bump_author_posts(sender, instance, **kwargs):
+    Post.objects.bump_version(user_id=instance.user_id)
+
+
+# Every comment delete lowers the counter, including those cascaded from a user and those made in the admin
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    adjust(Post.objects.filter(id=instance.post_id), comment_count=-1, version=1)
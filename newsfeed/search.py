@@ -0,0 +1,137 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+
+# Full-text indexes mirror the text columns of their content tables through triggers,
+# so they stay in sync with every insert, update and delete, including bulk ones.
+INDEXES = (
+    # (index table, content table, text column)
+    ('newsfeed_post_fts', 'newsfeed_post', 'body'),
+    ('newsfeed_comment_fts', 'newsfeed_comment', 'content'),
+)
+
+SEARCH_SQL = """
+    SELECT post_id, MIN(score) AS score FROM (
+        SELECT rowid AS post_id, bm25(newsfeed_post_fts) AS score
+        FROM newsfeed_post_fts WHERE newsfeed_post_fts MATCH %s
+        UNION ALL
+        SELECT c.post_id, bm25(newsfeed_comment_fts) AS score
+        FROM newsfeed_comment_fts JOIN newsfeed_comment c ON c.id = newsfeed_comment_fts.rowid
+        WHERE newsfeed_comment_fts MATCH %s
+    )
+    GROUP BY post_id
+    ORDER BY score, post_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor == 'sqlite'
+
+
+def _statements(index, table, column):
+    return [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({column}, content='{table}', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        "INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        "CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        "INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        "CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        "INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        "INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def install(conn=None):
+    """
+        Create the full-text indexes and their sync triggers if they are missing.
+        SQLite drops the triggers whenever a migration rebuilds a content table,
+        so this also runs after every migrate.
+    """
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        for index, table, column in INDEXES:
+            for statement in _statements(index, table, column):
+                cursor.execute(statement.format(index=index, table=table, column=column))
+
+
+def uninstall(conn=None):
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        for index, table, column in INDEXES:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute("DROP TRIGGER IF EXISTS {}_{}".format(index, suffix))
+            cursor.execute("DROP TABLE IF EXISTS {}".format(index))
+
+
+def reindex(chunk_size=5000, conn=None, progress=None):
+    """
+        Rebuild the full-text indexes from their content tables, one primary key
+        range at a time. Rows are copied by INSERT ... SELECT inside SQLite and
+        never loaded into Python. Returns the number of indexed rows per table.
+    """
+    conn = conn or connection
+    counts = {}
+    with conn.cursor() as cursor:
+        for index, table, column in INDEXES:
+            cursor.execute("INSERT INTO {0}({0}) VALUES ('delete-all')".format(index))
+            last_id = 0
+            counts[table] = 0
+            while True:
+                cursor.execute(
+                    "SELECT COUNT(*), MAX(id) FROM (SELECT id FROM {} WHERE id > %s ORDER BY id LIMIT %s)".format(table),
+                    [last_id, chunk_size])
+                rows, max_id = cursor.fetchone()
+                if not rows:
+                    break
+                cursor.execute(
+                    "INSERT INTO {index}(rowid, {column}) SELECT id, {column} FROM {table} "
+                    "WHERE id > %s AND id <= %s".format(index=index, table=table, column=column),
+                    [last_id, max_id])
+                last_id = max_id
+                counts[table] += rows
+                if progress:
+                    progress(table, counts[table])
+            cursor.execute("INSERT INTO {0}({0}) VALUES ('optimize')".format(index))
+    return counts
+
+
+def to_match_query(text):
+    """
+        Turn free user input into an FTS5 query: every word must match, the
+        last one as a prefix. Words are quoted so FTS5 operators are ignored.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = ['"{}"'.format(word) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_post_ids(text, offset=0, limit=10):
+    """
+        Ids of the posts whose body or comments match `text`, best match first.
+    """
+    query = to_match_query(text)
+    if query is None:
+        return []
+
+    if not is_supported():
+        # Other databases have no FTS5, fall back to a plain (unindexed) scan
+        posts = (
+            Post.objects.filter(Q(body__icontains=text) | Q(comments__content__icontains=text))
+                .distinct().order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        return list(posts[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [query, query, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
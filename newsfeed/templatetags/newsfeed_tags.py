@@ -0,0 +1,33 @@
+from django import template
+
+from newsfeed import fragments
+
+register = template.Library()
+
+
+class PostFragmentNode(template.Node):
+
+    def __init__(self, nodelist, post):
+        self.nodelist = nodelist
+        self.post = post
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        request = context.get('request')
+        is_owner = request is not None and post.user_id == request.user.id
+        return fragments.get_or_render(post, is_owner, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cache_post(parser, token):
+    """
+        Cache the enclosed block per post version:
+
+            {% cache_post post %} ... {% endcache_post %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError("'%s' tag requires exactly one argument." % bits[0])
+    nodelist = parser.parse(('endcache_post',))
+    parser.delete_first_token()
+    return PostFragmentNode(nodelist, parser.compile_filter(bits[1]))
@@ -1,3 +1,98 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from core.counters import adjust
+from friends.cache import friend_graph
+from friends.models import Friend
+from newsfeed.models import Comment, Post, TimelineEntry
+
+
+class CommentCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com',
+                                              password='x', gender='male')
+        cls.commenter = User.objects.create_user(username='commenter', email='commenter@example.com',
+                                                 password='x', gender='female')
+
+    def setUp(self):
+        self.post = Post.objects.create(user=self.author, body="hello")
+
+    def counted(self):
+        self.post.refresh_from_db()
+        return self.post.comment_count
+
+    def test_add_comment_increments_count_and_version(self):
+        Comment.objects.add_comment(self.post, self.commenter, "first")
+        Comment.objects.add_comment(self.post, self.commenter, "second")
+        self.assertEqual(self.counted(), 2)
+        self.assertEqual(self.post.version, 3)
+
+    def test_delete_decrements_count(self):
+        comment = Comment.objects.add_comment(self.post, self.commenter, "first")
+        Comment.objects.add_comment(self.post, self.commenter, "second")
+        comment.delete()
+        self.assertEqual(self.counted(), 1)
+        # Bulk deletes go through the same receiver
+        Comment.objects.filter(post=self.post).delete()
+        self.assertEqual(self.counted(), 0)
+
+    def test_cascaded_delete_decrements_count(self):
+        Comment.objects.add_comment(self.post, self.commenter, "first")
+        Comment.objects.add_comment(self.post, self.author, "second")
+        # Profile.user does not cascade, the profile goes first
+        self.commenter.profile.delete()
+        self.commenter.delete()
+        self.assertEqual(self.counted(), 1)
+
+    def test_counter_floors_at_zero(self):
+        adjust(Post.objects.filter(id=self.post.id), comment_count=-5)
+        self.assertEqual(self.counted(), 0)
+
+    def test_previews_survive_a_counter_ahead_of_the_comments(self):
+        Post.objects.filter(id=self.post.id).update(comment_count=10)
+        self.post.refresh_from_db()
+        Comment.objects.attach_previews([self.post])
+        self.assertEqual(self.post.preview_comments, [])
+        self.assertIsNone(self.post.comments_cursor)
+
+    def test_reconcile_counters_repairs_drift(self):
+        Comment.objects.add_comment(self.post, self.commenter, "first")
+        Post.objects.filter(id=self.post.id).update(comment_count=7)
+        call_command('reconcile_counters', dry_run=True, stdout=StringIO())
+        self.assertEqual(self.counted(), 7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counted(), 1)
+
+
+class TimelineFanOutTests(TestCase):
+
+    def setUp(self):
+        self.author, self.friend = (
+            User.objects.create_user(username=username, email='{}@example.com'.format(username),
+                                     password='x', gender='male')
+            for username in ('author', 'friend')
+        )
+        friend_graph.clear()
+        self.addCleanup(friend_graph.clear)
+
+    def test_fan_out_ignores_a_stale_friend_graph(self):
+        # Another worker accepted the friendship, this worker still caches the old friend set
+        self.assertEqual(Friend.objects.friend_ids(self.author), [])
+        Friend.objects.create_friendships([(self.author.id, self.friend.id)])
+
+        post = Post.objects.create(user=self.author, body="hello")
+        TimelineEntry.objects.fan_out(post)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.friend, post=post).exists())
+
+    def test_rebuild_ignores_a_stale_friend_graph(self):
+        post = Post.objects.create(user=self.author, body="hello")
+        self.assertEqual(Friend.objects.friend_ids(self.friend), [])
+        Friend.objects.create_friendships([(self.author.id, self.friend.id)])
+
+        TimelineEntry.objects.rebuild(self.friend)
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.friend, post=post).exists())
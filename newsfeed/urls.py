@@ -6,4 +6,7 @@ app_name = "newsfeed"
 urlpatterns = [
     path('post/create', PostCreateView.as_view(), name="post-create"),
     path('comment/create/<int:post_id>', create_comment, name="comment-create"),
+    path('comments/<int:post_id>', post_comments, name="comments"),
+    path('fragment-cache-stats', fragment_cache_stats, name="fragment-cache-stats"),
+    path('search', search_posts, name="search"),
 ]
@@ -1,16 +1,24 @@
 # Import necessary modules and classes
 import json
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
 # Import constants and models from the project
 from core.contants.common import COMMENT_VERB
+from core.delivery import deliver
+from core.pagination import keyset_page, InvalidCursor
 from friends.models import CustomNotification
 from friends.serializers import NotificationSerializer
+from . import fragments, search
 from .forms import PostCreateForm
 from .models import *
 
@@ -22,11 +30,14 @@ class PostCreateView(CreateView):
     template_name = 'home.html'
     success_url = reverse_lazy('core:home')
 
-    # If the form is valid, set the user for the post
+    # If the form is valid, set the user for the post and push it into the timelines of the author's friends
     def form_valid(self, form):
         if self.request.user.is_authenticated:
             form.instance.user = self.request.user
-        return super(PostCreateView, self).form_valid(form)
+        with transaction.atomic():
+            response = super(PostCreateView, self).form_valid(form)
+            TimelineEntry.objects.fan_out(self.object)
+        return response
 
     # If the form is invalid, redirect to the home page
     def form_invalid(self, form):
@@ -43,27 +54,86 @@ class PostCreateView(CreateView):
         else:
             return self.form_invalid(form)
 
-# Define a function to create a comment
-def create_comment(request, post_id=None):
+# Save a comment and the notification of the post owner, returning the channel event to push
+@sync_to_async
+def save_comment(request, post_id, content):
+    # Retrieve the post object based on the provided post_id
+    post = Post.objects.select_related('user').get(id=post_id)
+    # Save the comment, count it and invalidate the cached block of the post
+    Comment.objects.add_comment(post, request.user, content)
+    # Notify the post owner, folding the comment into a recent notification about the same post
+    notification, created = CustomNotification.objects.notify(post.user, request.user, COMMENT_VERB, post,
+                                                              "commented on your post")
+    channel = "comment_like_notifications_{}".format(post.user.username)
+    return channel, {
+        "type": "notify",
+        # A grouped comment replaces the frame of its notification instead of adding one
+        "command": "new_like_comment_notification" if created else "update_like_comment_notification",
+        "notification": json.dumps(NotificationSerializer(notification).data),
+        'unread_notifications': CustomNotification.objects.user_unread_notification_count(post.user)
+    }
+
+# Define an asynchronous function to create a comment
+async def create_comment(request, post_id=None):
     if request.method == "POST":
-        # Retrieve the post object based on the provided post_id
-        post = Post.objects.get(id=post_id)
-        # Create a notification for the post owner about the comment
-        notification = CustomNotification.objects.create(recipient=post.user, actor=request.user, verb=COMMENT_VERB,
-                                                         description="commented on your post")
-        # Use Channels to send a notification to the post owner
-        channel_layer = get_channel_layer()
-        channel = "comment_like_notifications_{}".format(post.user.username)
-        async_to_sync(channel_layer.group_send)(
-            channel, {
-                "type": "notify",
-                "command": "new_like_comment_notification",
-                "notification": json.dumps(NotificationSerializer(notification).data),
-                'unread_notifications': CustomNotification.objects.user_unread_notification_count(request.user)
-            }
-        )
+        content = request.POST.get('content', '').strip()
+        if content:
+            channel, event = await save_comment(request, post_id, content)
+            # Queue the notification for the post owner, bursts reach them as one batched frame
+            deliver(channel, event)
         # Redirect to the home page after creating the comment
         return redirect(reverse_lazy('core:home'))
     else:
         # If the method is not POST, redirect to the home page
         return redirect(reverse_lazy('core:home'))
+
+# Define a function returning older comments of a post, one cursor page at a time
+def post_comments(request, post_id=None):
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+
+    post = get_object_or_404(Post, id=post_id)
+    try:
+        comments, next_cursor = keyset_page(Comment.objects.feed(post), cursor=request.GET.get('cursor'),
+                                            limit=settings.COMMENT_PAGE_SIZE)
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
+
+    # Comments are fetched newest first but rendered oldest first, above the ones already shown
+    comments.reverse()
+    return JsonResponse({
+        'status': True,
+        'html': render_to_string('includes/comment-list.html', {'comments': comments}, request=request),
+        'next_cursor': next_cursor,
+    })
+
+# Define a staff-only view exposing the hit/miss counters of the post block cache
+@staff_member_required
+def fragment_cache_stats(request):
+    return JsonResponse(fragments.stats())
+
+# Define a view listing the posts matching a full-text query, best match first
+@login_required(login_url=reverse_lazy("accounts:login"))
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # Fetch one extra id to know whether another page exists
+    limit = settings.SEARCH_PAGE_SIZE
+    post_ids = search.search_post_ids(query, offset=(page - 1) * limit, limit=limit + 1)
+    has_next = len(post_ids) > limit
+    post_ids = post_ids[:limit]
+
+    # Load the posts of the page and keep the ranking order
+    posts_by_id = Post.objects.feed().in_bulk(post_ids)
+    posts = Comment.objects.attach_previews([posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id])
+
+    return render(request, 'newsfeed/search.html', {
+        'query': query,
+        'posts': posts,
+        'page': page,
+        'has_next': has_next,
+    })
@@ -8,6 +8,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.core import serializers
 
 # Import models and serializers
+from core.contants.common import COMMENT_VERB
 from friends.models import CustomNotification
 from friends.serializers import NotificationSerializer
 
@@ -17,7 +18,7 @@ User = get_user_model()
 # Define a function to fetch data asynchronously from the database
 @database_sync_to_async
 def get_data(user):
-    return CustomNotification.objects.select_related('actor').filter(recipient=user, type="comment", unread=True)[:7]
+    return list(CustomNotification.objects.unread(user, verb=COMMENT_VERB, limit=7))
 
 # Define a WebSocket consumer class to handle notifications
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
@@ -30,8 +31,7 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         if user.is_anonymous:
             return {'type': 'anonymous_user'}  # Return message for anonymous user
         # Fetch notifications for authenticated users
-        notifications = CustomNotification.objects.select_related('actor').filter(recipient=user, verb="comment",
-                                                                                  is_read=False)[:4]
+        notifications = CustomNotification.objects.unread(user, verb=COMMENT_VERB, limit=4)
         serializer = NotificationSerializer(notifications, many=True)
         # Prepare data to send through WebSocket
         content = {
@@ -70,6 +70,10 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
     async def notify(self, event):
         await self.send_json(event)
 
+    # Function to send the notifications batched by core.delivery as one frame
+    async def notify_batch(self, event):
+        await self.send_json({'command': 'batch', 'events': event['events']})
+
     # Function to send all notifications
     async def all_notifications(self, event):
         await self.send_json(event)
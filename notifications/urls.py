@@ -4,5 +4,7 @@ from .views import *
 app_name = "notifications"
 
 urlpatterns = [
+    path('notifications', UserAllNotificationListView.as_view(), name="inbox"),
+    path('notifications/api', notification_list, name="notification-list"),
     path('mark-like-comment-notifications-as-read', mark_like_comment_notifications_as_read, name="mark-like-comment-notifications-as-read"),
 ]
@@ -1,20 +1,82 @@
+from django.conf import settings
 from django.views.generic import ListView
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from core.contants.common import COMMENT_VERB
+from core.delivery import deliver
+from core.pagination import decode_cursor, keyset_page, InvalidCursor
 from friends.models import CustomNotification
+from friends.serializers import NotificationSerializer
+
+
+# Read one cursor page of the inbox of the current user
+def inbox_page(request):
+    unread_only = request.GET.get('unread') == '1'
+    return keyset_page(CustomNotification.objects.inbox(request.user, unread_only=unread_only),
+                       cursor=request.GET.get('cursor'), limit=settings.NOTIFICATION_PAGE_SIZE)
 
 
 class UserAllNotificationListView(LoginRequiredMixin, ListView):
     """
     Get all notifications for the user
     """
+    context_object_name = 'notifications'
+    template_name = "notifications/inbox.html"
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.object_list, self.next_cursor = inbox_page(request)
+        except InvalidCursor:
+            self.object_list, self.next_cursor = [], None
+        context = self.get_context_data(next_cursor=self.next_cursor, unread_only=request.GET.get('unread') == '1')
+        return self.render_to_response(context)
+
+
+# Return one cursor page of the inbox of the current user as JSON
+def notification_list(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+
+    try:
+        notifications, next_cursor = inbox_page(request)
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
 
+    return JsonResponse({
+        'status': True,
+        'notifications': NotificationSerializer(notifications, many=True).data,
+        'next_cursor': next_cursor,
+    })
 
+
+# Mark the comment notifications of the current user as read, up to the `cursor` of the newest one displayed
 def mark_like_comment_notifications_as_read(request):
-    CustomNotification.objects.filter(recipient=request.user, type="comment").update(unread=False)
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': False, 'message': "Login required"}, status=401)
+    if request.method != "POST":
+        return JsonResponse({'status': False, 'message': "POST required"}, status=405)
+
+    cursor = request.POST.get('cursor')
+    try:
+        read_up_to = decode_cursor(cursor) if cursor else None
+        updated = CustomNotification.objects.mark_read(request.user, cursor=cursor, verb=COMMENT_VERB)
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
+    unread = CustomNotification.objects.user_unread_notification_count(request.user)
+
+    # One event tells every open page of the user what was read
+    if updated:
+        deliver("comment_like_notifications_{}".format(request.user.username), {
+            "type": "notify",  # method name
+            "command": "notifications_read",
+            # Position of the newest notification read, null when everything was marked read
+            "read_up_to": {'created_at': read_up_to[0].isoformat(), 'id': read_up_to[1]} if read_up_to else None,
+            "unread_notifications": unread,
+        })
     return JsonResponse({
         'status': True,
-        'message': "Marked all notifications as read"
+        'message': "Marked {} notification(s) as read".format(updated),
+        'unread_notifications': unread,
     })
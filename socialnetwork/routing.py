@@ -1,11 +1,14 @@
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
+from django.core.asgi import get_asgi_application
 
 from friends import routing as friends_routing
 from notifications import routing as notifications_routing
 from communications import routing as communications_routing
 
 application = ProtocolTypeRouter({
+    # Plain HTTP goes through Django's ASGI handler, so async views run on the event loop
+    'http': get_asgi_application(),
     'websocket': AuthMiddlewareStack(
         URLRouter(
             friends_routing.websocket_urlpatterns + notifications_routing.websocket_urlpatterns + communications_routing.websocket_urlpatterns
@@ -118,3 +118,110 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 SITE_ID = 1
 
 LOGIN_URL = '/accounts/login'
+
+# Number of posts rendered per news feed page
+FEED_PAGE_SIZE = 10
+
+# Number of latest comments shown under each post, and per "View more comments" page
+COMMENT_PREVIEW_SIZE = 3
+COMMENT_PAGE_SIZE = 10
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered post blocks, point it at a shared backend (redis, memcached) to share it between workers
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'post-fragments',
+    },
+}
+
+# Cache alias and timeout (seconds) of the rendered post blocks
+POST_FRAGMENT_CACHE = 'fragments'
+POST_FRAGMENT_TIMEOUT = 300
+
+# Number of posts per search results page
+SEARCH_PAGE_SIZE = 10
+
+# Friend graph cache: number of users kept in the in-process LRU and how long (seconds) an entry is trusted.
+# Invalidations only clear the LRU of the worker that made them, other workers see a friend change once their
+# entry expires. Set a cache alias (with its timeout in seconds) to share the adjacency sets between workers
+# instead, so invalidations reach every worker at once.
+FRIEND_GRAPH_CACHE_SIZE = 10000
+FRIEND_GRAPH_LOCAL_TIMEOUT = 5
+FRIEND_GRAPH_CACHE = None
+FRIEND_GRAPH_CACHE_TIMEOUT = 300
+
+# Friend suggestions: candidates ranked per user, how long they are cached (seconds) and page size
+FRIEND_SUGGESTIONS_LIMIT = 200
+FRIEND_SUGGESTIONS_TIMEOUT = 300
+FRIEND_SUGGESTIONS_PAGE_SIZE = 20
+
+# Number of friend recommendations stored per user by the compute_recommendations command
+FRIEND_RECOMMENDATIONS_TOP_K = 50
+
+# Maximum number of user ids resolved by one relationship status request
+RELATIONSHIP_STATUS_MAX_IDS = 200
+
+# Maximum number of usernames accepted by the batch friend request endpoints
+FRIEND_BATCH_MAX_USERS = 100
+
+# Friendship layout: 'directed' keeps two Friend rows per friendship, 'symmetric' one Friendship row
+# per pair. Run the convert_friendships command after changing it.
+FRIENDSHIP_STORAGE = 'directed'
+
+# How long (seconds) the users info page caches the latest friend graph report
+GRAPH_REPORT_CACHE_TIMEOUT = 600
+
+# Number of notifications per inbox page
+NOTIFICATION_PAGE_SIZE = 20
+
+# Notifications of the same verb on the same object are grouped while they are less than this many
+# seconds apart, keeping this many of the latest actors
+NOTIFICATION_COALESCE_WINDOW = 3600
+NOTIFICATION_LATEST_ACTORS = 3
+
+# Lifetime (seconds) of the cached unread notification counters, they are recounted after it
+NOTIFICATION_UNREAD_TIMEOUT = 3600
+
+# Seconds websocket events for one group are buffered before being sent together, 0 sends them at once
+DELIVERY_WINDOW = 0.1
+
+# Most events sent in one batched frame, a fuller buffer is flushed before the window ends
+DELIVERY_BATCH_MAX = 50
+
+# Days read or dismissed notifications are kept per verb, other verbs use the default, None keeps them forever.
+# Unread notifications are kept NOTIFICATION_UNREAD_RETENTION_DAYS whatever their verb.
+# Enforced by the apply_retention command
+NOTIFICATION_RETENTION_DAYS = {
+    'friend_request': 30,
+    'like': 30,
+    'comment': 90,
+}
+NOTIFICATION_DEFAULT_RETENTION_DAYS = 90
+NOTIFICATION_UNREAD_RETENTION_DAYS = 365
+
+# Days a rejected friend request keeps blocking new requests between the two users before it is pruned
+FRIENDSHIP_REQUEST_REJECTED_RETENTION_DAYS = 90
+
+# Number of chat messages per history page, older pages are fetched with a `before` cursor
+CHAT_HISTORY_PAGE_SIZE = 20
+
+# Lifetime (seconds) of the cached room id of each pair of chatting users
+CHAT_ROOM_CACHE_TIMEOUT = 86400
+
+# Write-behind chat messages: broadcast at once, stored with one bulk insert at most
+# CHAT_WRITE_BEHIND_INTERVAL seconds later or once CHAT_WRITE_BEHIND_BATCH are waiting.
+# A message that fails to insert is retried CHAT_WRITE_BEHIND_RETRY_DELAY seconds later,
+# after CHAT_WRITE_BEHIND_RETRIES failed attempts it is logged and dropped
+CHAT_WRITE_BEHIND = False
+CHAT_WRITE_BEHIND_INTERVAL = 0.005
+CHAT_WRITE_BEHIND_BATCH = 200
+CHAT_WRITE_BEHIND_RETRIES = 3
+CHAT_WRITE_BEHIND_RETRY_DELAY = 1.0
+
+# Typing indicators: at most one typing_start per CHAT_TYPING_INTERVAL seconds per connection,
+# typing_stop is sent CHAT_TYPING_TIMEOUT seconds after the last keystroke
+CHAT_TYPING_INTERVAL = 2.0
+CHAT_TYPING_TIMEOUT = 3.0
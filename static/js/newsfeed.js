@@ -2,4 +2,99 @@ $("input[name='content']").keyup(function (event) {
     if (event.keyCode === 13) {
         $("#myButton").click();
     }
-});
\ No newline at end of file
+});
+
+$('#feed-load-more').click(function () {
+    let button = $(this);
+    if (button.hasClass('loading')) {
+        return;
+    }
+    button.addClass('loading');
+
+    $.ajax({
+        type: 'GET',
+        url: button.data('url'),
+        data: {'cursor': button.data('cursor')},
+        dataType: 'json',
+        success: function (res) {
+            button.removeClass('loading');
+            if (res.status) {
+                $('#' + button.data('container')).append(res.html);
+                if (res.next_cursor) {
+                    button.data('cursor', res.next_cursor);
+                } else {
+                    button.remove();
+                }
+            }
+        },
+        error: function (err) {
+            button.removeClass('loading');
+            console.log(err);
+        }
+    });
+});
+
+$(document).on('click', '.more-comments', function () {
+    let link = $(this);
+    if (link.hasClass('loading')) {
+        return;
+    }
+    link.addClass('loading');
+
+    $.ajax({
+        type: 'GET',
+        url: link.data('url'),
+        data: {'cursor': link.data('cursor')},
+        dataType: 'json',
+        success: function (res) {
+            link.removeClass('loading');
+            if (res.status) {
+                $('#' + link.data('container')).prepend(res.html);
+                if (res.next_cursor) {
+                    link.data('cursor', res.next_cursor);
+                } else {
+                    link.remove();
+                }
+            }
+        },
+        error: function (err) {
+            link.removeClass('loading');
+            console.log(err);
+        }
+    });
+});
+
+// Post blocks are cached with their absolute dates, the "X ago" text is computed here
+function relativeTime(date) {
+    let seconds = Math.max(0, Math.round((Date.now() - date.getTime()) / 1000));
+    let units = [['year', 31536000], ['month', 2592000], ['week', 604800], ['day', 86400],
+        ['hour', 3600], ['minute', 60], ['second', 1]];
+    if (seconds < 10) {
+        return 'now';
+    }
+    for (let [name, length] of units) {
+        let count = Math.floor(seconds / length);
+        if (count >= 1) {
+            return count + ' ' + name + (count > 1 ? 's' : '') + ' ago';
+        }
+    }
+}
+
+function updateRelativeTimes(root) {
+    $(root || document).find('time.relative-time').each(function () {
+        let date = new Date($(this).attr('datetime'));
+        if (!isNaN(date)) {
+            $(this).text(relativeTime(date));
+        }
+    });
+}
+
+$(function () {
+    updateRelativeTimes();
+    setInterval(updateRelativeTimes, 60000);
+});
+
+// Posts and comments loaded later carry absolute dates too
+$(document).ajaxComplete(function () {
+    updateRelativeTimes();
+});
@@ -66,7 +66,16 @@ function fetchFriendRequests() {
     // friendRequestNotificationSocket.send(JSON.stringify({'command': 'fetch_friend_requests'}));
 }
 
+// Newest friend request displayed and whether it was marked viewed yet
+let newestFriendRequest = null;
+let newestFriendRequestViewed = true;
+
 function createNotification(notification) {
+    if (newestFriendRequest === null ||
+        isNewerNotification(notification.created_at, notification.id, newestFriendRequest)) {
+        newestFriendRequest = notification;
+        newestFriendRequestViewed = notification.viewed !== null;
+    }
     let single = `<li>
                         <div class="container">
                             <div class="row">
@@ -90,9 +99,11 @@ function createNotification(notification) {
     $('#friend-requests').prepend(single);
 }
 
-friendRequestNotificationSocket.onmessage = function (event) {
-    let data = JSON.parse(event.data);
-    if (data['command'] === "all_friend_requests") {
+function handleFriendRequestMessage(data) {
+    if (data['command'] === 'batch') {
+        // Events queued within the delivery window arrive together
+        data['events'].forEach(handleFriendRequestMessage);
+    } else if (data['command'] === "all_friend_requests") {
         let notifications = data['friend_requests'];
         $('#total-friend-requests').text(notifications.length);
         for (let i = 0; i < notifications.length; i++) {
@@ -102,7 +113,14 @@ friendRequestNotificationSocket.onmessage = function (event) {
         let notification = $('#total-friend-requests');
         notification.text(parseInt(notification.text()) + 1);
         createNotification(data['notification']);
+    } else if (data['command'] === 'friend_requests_accepted') {
+        let notification = $('#total-friend-requests');
+        notification.text(Math.max(parseInt(notification.text()) - data['usernames'].length, 0));
     }
+}
+
+friendRequestNotificationSocket.onmessage = function (event) {
+    handleFriendRequestMessage(JSON.parse(event.data));
 };
 
 console.log(window.location.host);
@@ -117,9 +135,21 @@ function fetchNotifications() {
     likeCommentNotificationSocket.send(JSON.stringify({'command': 'fetch_like_comment_notifications'}));
 }
 
+// Newest notification displayed, "Mark all as read" marks up to its cursor only
+let newestLikeCommentNotification = null;
+
+function isNewerNotification(createdAt, id, than) {
+    let date = Date.parse(createdAt), thanDate = Date.parse(than['created_at']);
+    return date > thanDate || (date === thanDate && id > than['id']);
+}
+
 function createLikeCommentNotification(notification) {
+    if (newestLikeCommentNotification === null ||
+        isNewerNotification(notification.created_at, notification.id, newestLikeCommentNotification)) {
+        newestLikeCommentNotification = notification;
+    }
     let single = `
-                <li>
+                <li data-notification-id="${notification.id}" data-created-at="${notification.created_at}">
                     <div class="author-thumb">
 <!--                        <img src="img/avatar62-sm.jpg" alt="author">-->
                     </div>
@@ -143,9 +173,11 @@ likeCommentNotificationSocket.onopen = function (e) {
     fetchNotifications();
 };
 
-likeCommentNotificationSocket.onmessage = function (event) {
-    let data = JSON.parse(event.data);
-    if (data['command'] === 'notifications') {
+function handleLikeCommentMessage(data) {
+    if (data['command'] === 'batch') {
+        // Events queued within the delivery window arrive together
+        data['events'].forEach(handleLikeCommentMessage);
+    } else if (data['command'] === 'notifications') {
         let unread_notifications = data['unread_notifications'];
         $('#notification-count').text(unread_notifications);
         let notifications = data['notifications'];
@@ -153,15 +185,58 @@ likeCommentNotificationSocket.onmessage = function (event) {
             createLikeCommentNotification(notifications[i]);
         }
     } else if (data['command'] === 'new_like_comment_notification') {
-        let notification = $('#total-like-comment-notifications');
-        notification.text(parseInt(notification.text()) + 1);
+        $('#notification-count').text(data['unread_notifications']);
         createLikeCommentNotification(JSON.parse(data['notification']));
+    } else if (data['command'] === 'update_like_comment_notification') {
+        // A grouped notification moves to the top with its new actors
+        let notification = JSON.parse(data['notification']);
+        $(`#like-comment-menu li[data-notification-id="${notification.id}"]`).remove();
+        createLikeCommentNotification(notification);
+    } else if (data['command'] === 'notifications_read') {
+        // Sent to every open page once notifications are marked read, newer ones stay listed
+        $('#notification-count').text(data['unread_notifications']);
+        let readUpTo = data['read_up_to'];
+        $('#like-comment-menu li').filter(function () {
+            return readUpTo === null || !isNewerNotification($(this).data('created-at'), $(this).data('notification-id'), readUpTo);
+        }).remove();
     }
+}
+
+likeCommentNotificationSocket.onmessage = function (event) {
+    handleLikeCommentMessage(JSON.parse(event.data));
 };
 
+// Opening the friend requests dropdown marks the requests in it as viewed, up to the newest one
+$('#friend-requests-menu').mouseenter(function () {
+    if (newestFriendRequest === null || newestFriendRequestViewed) {
+        return;
+    }
+    newestFriendRequestViewed = true;
+
+    $.ajaxSetup({
+        headers: {
+            'X-CSRFToken': csrfmiddlewaretoken
+        }
+    });
+
+    $.ajax({
+        type: 'POST',
+        url: $(this).data('url'),
+        data: {'cursor': newestFriendRequest.cursor},
+        dataType: 'json',
+        error: function (err) {
+            newestFriendRequestViewed = false;
+            console.log(err);
+        }
+    });
+});
+
 $('#mark-like-comment-notifications-as-read').click(function () {
 
     let url = $(this).data('url');
+    if (newestLikeCommentNotification === null) {
+        return;
+    }
 
     $.ajaxSetup({
         headers: {
@@ -172,6 +247,7 @@ $('#mark-like-comment-notifications-as-read').click(function () {
     $.ajax({
         type: 'POST',
         url: url,
+        data: {'cursor': newestLikeCommentNotification.cursor},
         dataType: 'json',
         success: function (res) {
             console.log(res);
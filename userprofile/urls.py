@@ -7,4 +7,5 @@ urlpatterns = [
     path('edit-profile', ProfileEditView.as_view(), name="edit-profile"),
     path('users-info', Profileusersinfo.as_view(), name="users-info"),
     path('<slug:username>', TimelineView.as_view(), name="user-timeline"),
+    path('<slug:username>/feed', timeline_feed, name="user-timeline-feed"),
 ]
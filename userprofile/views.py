@@ -1,8 +1,14 @@
-from django.shortcuts import render, redirect
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.views.generic import DetailView, UpdateView, ListView
 
 from accounts.models import User
+from core.pagination import keyset_page, InvalidCursor
+from friends.models import GraphReport
+from newsfeed.models import Post, Comment
 from userprofile.models import Profile
 
 import pandas as pd # For data processing
@@ -19,14 +25,40 @@ class TimelineView(DetailView):
     object = None
 
     def get_object(self, queryset=None):
-        return self.model.objects.select_related('profile').prefetch_related("posts").get(username=self.kwargs.get(self.slug_url_kwarg))
+        return self.model.objects.select_related('profile').get(username=self.kwargs.get(self.slug_url_kwarg))
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
-        context = self.get_context_data(object=self.object)
+
+        # Fetching the first page of the user's posts with comment previews, newest first
+        posts, next_cursor = timeline_posts(self.object)
+        context = self.get_context_data(object=self.object, posts=posts, next_cursor=next_cursor)
         return self.render_to_response(context)
 
 
+def timeline_posts(user, cursor=None):
+    posts, next_cursor = keyset_page(Post.objects.feed().filter(user=user), cursor=cursor,
+                                     limit=settings.FEED_PAGE_SIZE)
+    Comment.objects.attach_previews(posts)
+    return posts, next_cursor
+
+
+def timeline_feed(request, username):
+    # Following pages of a user's timeline, requested by the "load more" button
+    user = get_object_or_404(User, username=username)
+    try:
+        posts, next_cursor = timeline_posts(user, cursor=request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'status': False, 'message': str(e)}, status=400)
+
+    # Returning the rendered posts and the cursor of the next page
+    return JsonResponse({
+        'status': True,
+        'html': render_to_string('includes/post-list.html', {'posts': posts}, request=request),
+        'next_cursor': next_cursor,
+    })
+
+
 class ProfileEditView(UpdateView):
     model = Profile
     template_name = "profile/edit-my-profile.html"
@@ -77,3 +109,9 @@ class Profileusersinfo(DetailView):
         plt.savefig("gender-Python.png", bbox_inches='tight', dpi=300)
 
         return "gender-Python.png"
+
+    # Add the cached summary of the latest friend graph report
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['graph_report'] = GraphReport.objects.latest_summary()
+        return context